@@ -1,23 +1,291 @@
 from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
 from pymongo.server_api import ServerApi
+from gridfs import GridFS
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from dotenv import load_dotenv
+import asyncio
 import os
+import threading
 load_dotenv()
 
 uri = os.environ.get("MONGO_URI")
+MONGO_DATABASE = os.environ.get("MONGO_DATABASE", "mydatabase")
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+# How long a query waits for a free connection when the pool is exhausted
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+# Comma separated, e.g. "zstd,snappy,zlib"; zstd and snappy need their packages installed
+MONGO_COMPRESSORS = os.environ.get("MONGO_COMPRESSORS", "")
+# Threads that run blocking pymongo calls for the async routers
+MONGO_THREADS = int(os.environ.get("MONGO_THREADS", "32"))
+
+
+class PoolStats(ConnectionPoolListener):
+    """Connection pool usage per server, from the driver's pool events."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pools = {}
+
+    def pool(self, address) -> dict:
+        key = f"{address[0]}:{address[1]}"
+        pool = self.pools.get(key)
+        if pool is None:
+            pool = self.pools[key] = {
+                "open": 0, "in_use": 0, "waiting": 0, "checkouts": 0,
+                "checkout_failures": {}, "cleared": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+            }
+        return pool
+
+    def update(self, address, **changes):
+        with self.lock:
+            pool = self.pool(address)
+            for name, change in changes.items():
+                pool[name] += change
+
+    def pool_created(self, event):
+        with self.lock:
+            self.pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.update(event.address, cleared=1)
+
+    def pool_closed(self, event):
+        with self.lock:
+            self.pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        self.update(event.address, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.update(event.address, open=-1)
+
+    def connection_check_out_started(self, event):
+        self.update(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            pool = self.pool(event.address)
+            pool["waiting"] -= 1
+            pool["checkout_failures"][event.reason] = pool["checkout_failures"].get(event.reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        # Older drivers do not report how long the checkout waited
+        duration = getattr(event, "duration", None) or 0.0
+        with self.lock:
+            pool = self.pool(event.address)
+            pool["waiting"] -= 1
+            pool["in_use"] += 1
+            pool["checkouts"] += 1
+            pool["wait_seconds_total"] += duration
+            pool["wait_seconds_max"] = max(pool["wait_seconds_max"], duration)
+
+    def connection_checked_in(self, event):
+        self.update(event.address, in_use=-1)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {address: {**pool, "checkout_failures": dict(pool["checkout_failures"])}
+                    for address, pool in self.pools.items()}
+
+
+pool_stats = PoolStats()
+# Both owned by the application lifespan, see connect() and close()
+client = None
+db_executor = None
+db_calls_in_flight = 0
+
+
+def client_options() -> dict:
+    options = {
+        "server_api": ServerApi('1'),
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "event_listeners": [pool_stats],
+    }
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+
+def connect():
+    # MongoClient connects in the background, nothing here waits on the network
+    global client, db_executor
+    if client is None:
+        client = MongoClient(uri, **client_options())
+    if db_executor is None:
+        db_executor = ThreadPoolExecutor(max_workers=MONGO_THREADS, thread_name_prefix="mongo")
+    return client
+
+
+def close():
+    global client, db_executor
+    if db_executor is not None:
+        db_executor.shutdown(wait=True)
+        db_executor = None
+    if client is not None:
+        client.close()
+        client = None
+
+
+async def ping():
+    try:
+        await run_db(client.admin.command, 'ping')
+        print("Pinged your deployment. You successfully connected to MongoDB!")
+    except Exception as e:
+        print(e)
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking database call on the database threads."""
+    global db_calls_in_flight
+    if db_executor is None:
+        raise ValueError("MongoDB client is not connected")
+    loop = asyncio.get_running_loop()
+    db_calls_in_flight += 1
+    try:
+        return await loop.run_in_executor(db_executor, partial(fn, *args, **kwargs))
+    finally:
+        db_calls_in_flight -= 1
 
-# Send a ping to confirm a successful connection
-try:
-    client = MongoClient(uri, server_api=ServerApi('1'))
-    client.admin.command('ping')
-    print("Pinged your deployment. You successfully connected to MongoDB!")
-except Exception as e:
-    print(e)
-    client = None
 
 def get_database():
     if client:
-        db = client["mydatabase"]
+        db = client[MONGO_DATABASE]
         return db
     else:
         raise ValueError("MongoDB client is not connected")
+
+
+def database_stats() -> dict:
+    options = client_options()
+    return {
+        "client_open": client is not None,
+        "options": {name: options[name] for name in (
+            "maxPoolSize", "minPoolSize", "waitQueueTimeoutMS", "serverSelectionTimeoutMS")},
+        "compressors": MONGO_COMPRESSORS.split(",") if MONGO_COMPRESSORS else [],
+        "threads": MONGO_THREADS,
+        "calls_in_flight": db_calls_in_flight,
+        "pools": pool_stats.stats(),
+    }
+
+
+class LazyCollection:
+    """A collection of the lifespan's client, looked up on every use.
+
+    Lets routers keep module-level collections without a client existing
+    when they are imported.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_database()[self.name], attr)
+
+
+class AsyncCollection:
+    """A pymongo collection whose calls are awaited instead of blocking the event loop.
+
+    Cursors are read to the end on the database threads, so find() and
+    aggregate() return lists.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+
+    async def find(self, *args, **kwargs) -> list:
+        return await run_db(lambda: list(self.collection.find(*args, **kwargs)))
+
+    async def aggregate(self, pipeline, **kwargs) -> list:
+        return await run_db(lambda: list(self.collection.aggregate(pipeline, **kwargs)))
+
+    async def distinct(self, key, *args, **kwargs) -> list:
+        return await run_db(self.collection.distinct, key, *args, **kwargs)
+
+    async def find_one(self, *args, **kwargs):
+        return await run_db(self.collection.find_one, *args, **kwargs)
+
+    async def find_one_and_update(self, *args, **kwargs):
+        return await run_db(self.collection.find_one_and_update, *args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs) -> int:
+        return await run_db(self.collection.count_documents, *args, **kwargs)
+
+    async def insert_one(self, *args, **kwargs):
+        return await run_db(self.collection.insert_one, *args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs):
+        return await run_db(self.collection.insert_many, *args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return await run_db(self.collection.update_one, *args, **kwargs)
+
+    async def update_many(self, *args, **kwargs):
+        return await run_db(self.collection.update_many, *args, **kwargs)
+
+    async def replace_one(self, *args, **kwargs):
+        return await run_db(self.collection.replace_one, *args, **kwargs)
+
+    async def delete_one(self, *args, **kwargs):
+        return await run_db(self.collection.delete_one, *args, **kwargs)
+
+    async def delete_many(self, *args, **kwargs):
+        return await run_db(self.collection.delete_many, *args, **kwargs)
+
+    async def bulk_write(self, *args, **kwargs):
+        return await run_db(self.collection.bulk_write, *args, **kwargs)
+
+
+class AsyncGridFS:
+    """GridFS calls run on the database threads; find() returns a list of files."""
+
+    def __init__(self, db):
+        self.fs = GridFS(db)
+
+    async def put(self, data, **kwargs):
+        return await run_db(self.fs.put, data, **kwargs)
+
+    async def get(self, file_id):
+        return await run_db(self.fs.get, file_id)
+
+    async def find(self, *args, **kwargs) -> list:
+        return await run_db(lambda: list(self.fs.find(*args, **kwargs)))
+
+    async def find_one(self, *args, **kwargs):
+        return await run_db(self.fs.find_one, *args, **kwargs)
+
+    async def delete(self, file_id):
+        return await run_db(self.fs.delete, file_id)
+
+    async def read(self, grid_out) -> bytes:
+        return await run_db(grid_out.read)
+
+    async def stream(self, grid_out):
+        # One stored chunk per read, so large files are not held in memory
+        while True:
+            chunk = await run_db(grid_out.readchunk)
+            if not chunk:
+                break
+            yield chunk
+
+
+class AsyncDatabase:
+    @property
+    def gridfs(self) -> AsyncGridFS:
+        return AsyncGridFS(get_database())
+
+    def __getitem__(self, name) -> AsyncCollection:
+        return AsyncCollection(LazyCollection(name))
@@ -1,8 +1,75 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import partial
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import users, doctors, chat, chatbot, appointments,medical_data,notification, prescriptions,life_style_disease, image_processing
+import database
+from routers import users, doctors, chat, chatbot, appointments,medical_data,notification, prescriptions,life_style_disease, image_processing, models, db_admin
+from utils.indexes import bootstrap_indexes
+from utils.inference import executor
+from utils.llm import llm_client
+from utils.model_registry import registry
+
+# Seconds between checks for replaced model files, 0 disables the watcher
+MODEL_WATCH_SECONDS = float(os.environ.get("MODEL_WATCH_SECONDS", "0"))
+# Set to 0 where indexes are managed outside the app
+MONGO_CREATE_INDEXES = os.environ.get("MONGO_CREATE_INDEXES", "1") == "1"
+
+
+async def in_background(name, fn):
+    # Database work at startup and shutdown logs its failure instead of stopping the app
+    try:
+        await fn()
+    except Exception as e:
+        print(f"{name} failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Taken before serving, every prediction after it goes through record()
+    started = datetime.utcnow()
+    # One MongoDB client for the whole app; it connects in the background
+    database.connect()
+    startup_tasks = [asyncio.create_task(database.ping())]
+    if MONGO_CREATE_INDEXES:
+        indexes = partial(database.run_db, bootstrap_indexes, database.get_database())
+        startup_tasks.append(asyncio.create_task(in_background("Index bootstrap", indexes)))
+
+    # Deserialize and warm up every model once instead of on each request
+    registry.load_all()
+    loops = []
+    if MODEL_WATCH_SECONDS > 0:
+        loops.append(asyncio.create_task(registry.watch(MODEL_WATCH_SECONDS)))
+    # Inference workers load the models before the first request
+    await executor.start()
+
+    # Counts predictions stored before the counters existed, only once; the
+    # ones from started on are counted as they come in
+    loops.append(asyncio.create_task(chatbot.backfill_disease_counters(started)))
+    startup_tasks.append(asyncio.create_task(in_background("Case sketch restore", chatbot.restore_case_sketches)))
+    # Outbreak detection and alert emails run here, off the request path
+    if chatbot.OUTBREAK_CHECK_SECONDS > 0:
+        loops.append(asyncio.create_task(chatbot.outbreak_monitor.run()))
+    # One pooled HTTP client for every completion request
+    llm_client.start()
+
+    yield
+
+    for task in loops:
+        task.cancel()
+    # The case sketch restore finishes before this process saves its own
+    await asyncio.gather(*startup_tasks)
+    # Kept in memory between requests, persisted so a restart keeps them
+    await in_background("Case sketch save", chatbot.save_case_sketches)
+    executor.shutdown()
+    await llm_client.close()
+    database.close()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add the following line after including the users and doctors routers
 app.include_router(users.router, prefix="/api", tags=["users"])
@@ -15,6 +82,8 @@ app.include_router(notification.router, prefix="/api", tags=["notification"])
 app.include_router(prescriptions.router, prefix="/api",tags=["prescriptions"])
 app.include_router(life_style_disease.router, prefix="/api", tags=["Life Style Disease Prediction"])
 app.include_router(image_processing.router, prefix="/api", tags=["image processing"])
+app.include_router(models.router, prefix="/api", tags=["models"])
+app.include_router(db_admin.router, prefix="/api", tags=["database"])
 
 # Define the allowed origins for CORS
 # origins = [
@@ -0,0 +1,140 @@
+# prediction/benchmark.py
+#
+# Offline accuracy and latency regression check for the served models.
+#
+#   python -m prediction.benchmark --save bench.json        # record a baseline
+#   python -m prediction.benchmark --baseline bench.json    # compare against it
+#
+# Models are loaded through the same registry and scored through the same
+# inference executor the routers use, so the artifact format, compiled engine
+# and worker settings in the environment are what gets measured. The symptom
+# ensemble is replayed on Testing.csv, the lifestyle models on the held-out
+# split used at training time. Exits with status 1 when a model regresses
+# past the configured thresholds.
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from prediction.train import PREDICTION_DIR, TRAINING_SPECS, holdout_split
+from utils.inference import executor
+from utils.model_registry import registry
+
+
+def resident_memory() -> int:
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current RSS, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def evaluation_data(name):
+    if name == "symptom":
+        test_data = pd.read_csv(os.path.join(PREDICTION_DIR, TRAINING_SPECS[name]["test_data"])).dropna(axis=1)
+        return test_data.iloc[:, :-1].to_numpy(), test_data.iloc[:, -1].to_numpy()
+    X_train, X_test, y_train, y_test = holdout_split(name)
+    return X_test.to_numpy(dtype=np.float64), y_test.to_numpy()
+
+
+async def benchmark_model(name, single_rows, batch_repeats):
+    before = resident_memory()
+    entry = registry.load(name)
+    memory = resident_memory() - before
+
+    X, y = evaluation_data(name)
+    predictions = np.asarray(await executor.predict_batch(name, X))
+    accuracy = float(np.mean(predictions == y))
+
+    latencies = []
+    for i in range(single_rows):
+        row = X[i % len(X)]
+        start = time.perf_counter()
+        await executor.predict(name, row)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(batch_repeats):
+        await executor.predict_batch(name, X)
+    throughput = batch_repeats * len(X) / (time.perf_counter() - start)
+
+    return {
+        "version": entry.version,
+        "engine": entry.engine,
+        "rows": len(X),
+        "accuracy": accuracy,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "rows_per_second": throughput,
+        "resident_bytes": memory,
+    }
+
+
+def regressions(report, baseline, max_accuracy_drop, max_latency_regression):
+    failures = []
+    for name, current in report.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if previous["accuracy"] - current["accuracy"] > max_accuracy_drop:
+            failures.append(f"{name}: accuracy {previous['accuracy']:.4f} -> {current['accuracy']:.4f}")
+        if current["p99_ms"] > previous["p99_ms"] * (1 + max_latency_regression):
+            failures.append(f"{name}: p99 {previous['p99_ms']:.3f}ms -> {current['p99_ms']:.3f}ms")
+        if current["rows_per_second"] < previous["rows_per_second"] * (1 - max_latency_regression):
+            failures.append(f"{name}: throughput {previous['rows_per_second']:.0f} -> {current['rows_per_second']:.0f} rows/s")
+    return failures
+
+
+async def run(names, single_rows, batch_repeats):
+    await executor.start()
+    try:
+        return {name: await benchmark_model(name, single_rows, batch_repeats) for name in names}
+    finally:
+        executor.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark model accuracy, latency and memory")
+    parser.add_argument("models", nargs="*", help=f"models to benchmark (default: all of {', '.join(registry.specs)})")
+    parser.add_argument("--single-rows", type=int, default=200, help="single-row predictions timed per model")
+    parser.add_argument("--batch-repeats", type=int, default=20, help="passes over the evaluation set for throughput")
+    parser.add_argument("--baseline", help="report to compare against")
+    parser.add_argument("--save", help="write this run's report here")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01, help="allowed absolute accuracy drop")
+    parser.add_argument("--max-latency-regression", type=float, default=0.25,
+                        help="allowed relative p99 increase or throughput decrease")
+    args = parser.parse_args(argv)
+
+    names = args.models or list(registry.specs)
+    report = asyncio.run(run(names, args.single_rows, args.batch_repeats))
+
+    for name, result in report.items():
+        print(f"{name:10} acc {result['accuracy']:.4f}  p50 {result['p50_ms']:.3f}ms  "
+              f"p99 {result['p99_ms']:.3f}ms  {result['rows_per_second']:.0f} rows/s  "
+              f"rss +{result['resident_bytes'] / 2**20:.1f}MiB  ({result['engine']} {result['version']})")
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        failures = regressions(report, baseline, args.max_accuracy_drop, args.max_latency_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# prediction/compress.py
+#
+# Size/accuracy/latency trade-off report for compressed random forests.
+#
+#   python -m prediction.compress symptom
+#   python -m prediction.compress heart --variants baseline trees=50 trees=50,float32,quantize=8
+#   python -m prediction.compress heart --export trees=50,float32
+#
+# A variant is "baseline" (the exact compiled forest) or a comma separated
+# list of: trees=N (keep the first N estimators), depth=N (prune every tree
+# to depth N), float32 (single precision thresholds), quantize=B (B-bit leaf
+# values). For the symptom ensemble only the random forest is compressed and
+# accuracy is that of the whole ensemble on Testing.csv. --export writes the
+# chosen variant as the served memory-mapped artifact.
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from prediction.benchmark import evaluation_data, resident_memory
+from utils.artifacts import artifact_path, export_artifact, load_artifact
+from utils.forest import CompiledForest
+from utils.model_registry import MODEL_SPECS, file_version, majority_vote
+
+DEFAULT_VARIANTS = [
+    "baseline",
+    "float32",
+    "quantize=8",
+    "trees=50",
+    "trees=25",
+    "depth=12",
+    "trees=50,float32,quantize=8",
+    "trees=25,depth=12,float32,quantize=8",
+]
+
+
+def parse_variant(variant):
+    options = {}
+    if variant == "baseline":
+        return options
+    for part in variant.split(","):
+        key, _, value = part.partition("=")
+        if key == "float32":
+            options["float32"] = True
+        elif key in ("trees", "depth", "quantize"):
+            options[key] = int(value)
+        else:
+            raise ValueError(f"Unknown compression option {part}")
+    return options
+
+
+def with_forest(model, forest):
+    if isinstance(model, tuple):
+        return (forest,) + model[1:]
+    return forest
+
+
+def predict_model(model, X):
+    if isinstance(model, tuple):
+        final_rf_model, final_nb_model, final_svm_model, data_dict = model
+        votes = majority_vote(final_rf_model.predict(X), final_nb_model.predict(X), final_svm_model.predict(X))
+        return np.asarray(data_dict["predictions_classes"])[votes]
+    return model.predict(X)
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, filename))
+               for root, dirs, files in os.walk(path) for filename in files)
+
+
+def measure(candidate, X, y, single_rows):
+    with tempfile.TemporaryDirectory() as directory:
+        export_artifact(candidate, directory, source_version="variant")
+        size = directory_size(directory)
+        gc.collect()
+        before = resident_memory()
+        # Read fully into memory so the RSS reflects the model size
+        loaded = load_artifact(os.path.join(directory, "manifest.json"), mmap_mode=None)
+        memory = resident_memory() - before
+
+    accuracy = float(np.mean(predict_model(loaded, X) == y))
+    latencies = []
+    for i in range(single_rows):
+        start = time.perf_counter()
+        predict_model(loaded, X[i % len(X)][None, :])
+        latencies.append(time.perf_counter() - start)
+    return {
+        "artifact_bytes": size,
+        "resident_bytes": memory,
+        "accuracy": accuracy,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare compressed variants of a model's random forest")
+    parser.add_argument("model", choices=list(MODEL_SPECS))
+    parser.add_argument("--variants", nargs="+", default=DEFAULT_VARIANTS)
+    parser.add_argument("--single-rows", type=int, default=200)
+    parser.add_argument("--save", help="write the report here as JSON")
+    parser.add_argument("--export", metavar="VARIANT", help="write this variant as the served artifact")
+    args = parser.parse_args(argv)
+
+    spec = MODEL_SPECS[args.model]
+    model = spec.loader(spec.path)
+    base = CompiledForest.from_sklearn(model[0] if isinstance(model, tuple) else model)
+    X, y = evaluation_data(args.model)
+
+    report = {}
+    for variant in args.variants:
+        forest = base.compress(**parse_variant(variant)) if variant != "baseline" else base
+        result = measure(with_forest(model, forest), X, y, args.single_rows)
+        result["trees"] = int(forest.roots.shape[0])
+        result["nodes"] = int(forest.feature.shape[0])
+        # RSS deltas are noisy for small models, the forest's own arrays are not
+        result["forest_bytes"] = int(forest.nbytes())
+        report[variant] = result
+        print(f"{variant:40} {result['trees']:4d} trees {result['nodes']:7d} nodes  "
+              f"{result['artifact_bytes'] / 1024:9.1f}KiB on disk  {result['forest_bytes'] / 1024:9.1f}KiB forest  "
+              f"rss +{result['resident_bytes'] / 1024:8.1f}KiB  "
+              f"acc {result['accuracy']:.4f}  p50 {result['p50_ms']:.3f}ms  p99 {result['p99_ms']:.3f}ms")
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.export:
+        forest = base.compress(**parse_variant(args.export)) if args.export != "baseline" else base
+        version = file_version(spec.path) + "-" + args.export.replace(",", "-").replace("=", "")
+        manifest_path = export_artifact(with_forest(model, forest), os.path.dirname(artifact_path(args.model)),
+                                        source=spec.path, source_version=version)
+        print(f"Exported {args.model} {args.export} -> {manifest_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
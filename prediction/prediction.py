@@ -1,237 +0,0 @@
-# -*- coding: utf-8 -*-
-"""prediction.ipynb
-
-Automatically generated by Colaboratory.
-
-Original file is located at
-    https://colab.research.google.com/drive/1aiVr0iuKxQhNB-oPXMwMaPkc_rKCqQfT
-"""
-
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import mode
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import confusion_matrix
-from sklearn.metrics import accuracy_score
-from sklearn.metrics import classification_report
-from sklearn.naive_bayes import GaussianNB
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.svm import SVC
-from sklearn.preprocessing import LabelEncoder
-import joblib
-
-print("Imported all the libraries")
-
-# Reading the train.csv by removing the
-# last column since it's an empty column
-DATA_PATH = "Training.csv"
-data = pd.read_csv(DATA_PATH).dropna(axis = 1)
-
-# Checking whether the dataset is balanced or not
-disease_counts = data["prognosis"].value_counts()
-temp_df = pd.DataFrame({
-    "Disease": disease_counts.index,
-    "Counts": disease_counts.values
-})
-
-plt.figure(figsize = (18,8))
-sns.barplot(x = "Disease", y = "Counts", data = temp_df)
-plt.xticks(rotation=90)
-plt.show()
-print("The dataset is balanced")
-
-# Encoding the target value into numerical
-# value using LabelEncoder
-le = LabelEncoder()
-data["prognosis"] = le.fit_transform(data["prognosis"])
-
-print("Encoded the target value into numerical value")
-
-# Splitting the dataset into train and test
-X = data.iloc[:,:-1]
-y = data.iloc[:, -1]
-X_train, X_test, y_train, y_test =train_test_split(
-  X, y, test_size = 0.2, random_state = 24)
- 
-print(f"Train: {X_train.shape}, {y_train.shape}")
-print(f"Test: {X_test.shape}, {y_test.shape}")
-
-# Defining scoring metric for k-fold cross validation
-print ("Defining scoring metric for k-fold cross validation")
-def cv_scoring(estimator, x, y):
-    return accuracy_score(y, estimator.predict(x))
-print("function defined")
-
-# Initializing Models
-print("Initializing Models")
-
-models = {
-    "SVC":SVC(),
-    "Gaussian NB":GaussianNB(),
-    "Random Forest":RandomForestClassifier(random_state=18)
-}
- 
-print("Models Initialized")
-
-# Producing cross validation score for the models
-print("Producing cross validation score for the models")
-for model_name in models:
-    model = models[model_name]
-    scores = cross_val_score(model, X, y, cv = 10, scoring = cv_scoring)
-    print("=="*30)
-    print(model_name)
-    print(f"Scores: {scores}")
-    print(f"Mean Score: {np.mean(scores)}")
-print("Cross validation score produced")
-
-# Training and testing SVM Classifier
-print("Training and testing SVM Classifier")
-svm_model = SVC()
-svm_model.fit(X_train, y_train)
-preds = svm_model.predict(X_test)
-
-print(f"Accuracy on train data by SVM Classifier\
-: {accuracy_score(y_train, svm_model.predict(X_train))*100}")
-
-print(f"Accuracy on test data by SVM Classifier\
-: {accuracy_score(y_test, preds)*100}")
-
-cf_matrix = confusion_matrix(y_test, preds)
-plt.figure(figsize=(12,8))
-sns.heatmap(cf_matrix, annot=True)
-plt.title("Confusion Matrix for SVM Classifier on Test Data")
-plt.show()
-
-# Training and testing Naive Bayes Classifier
-nb_model = GaussianNB()
-nb_model.fit(X_train, y_train)
-preds = nb_model.predict(X_test)
-print(f"Accuracy on train data by Naive Bayes Classifier\
-: {accuracy_score(y_train, nb_model.predict(X_train))*100}")
- 
-print(f"Accuracy on test data by Naive Bayes Classifier\
-: {accuracy_score(y_test, preds)*100}")
-cf_matrix = confusion_matrix(y_test, preds)
-plt.figure(figsize=(12,8))
-sns.heatmap(cf_matrix, annot=True)
-plt.title("Confusion Matrix for Naive Bayes Classifier on Test Data")
-plt.show()
-
-# Training and testing Random Forest Classifier
-rf_model = RandomForestClassifier(random_state=18)
-rf_model.fit(X_train, y_train)
-preds = rf_model.predict(X_test)
-print(f"Accuracy on train data by Random Forest Classifier\
-: {accuracy_score(y_train, rf_model.predict(X_train))*100}")
- 
-print(f"Accuracy on test data by Random Forest Classifier\
-: {accuracy_score(y_test, preds)*100}")
- 
-cf_matrix = confusion_matrix(y_test, preds)
-plt.figure(figsize=(12,8))
-sns.heatmap(cf_matrix, annot=True)
-plt.title("Confusion Matrix for Random Forest Classifier on Test Data")
-plt.show()
-
-# Training the models on whole data
-final_svm_model = SVC()
-final_nb_model = GaussianNB()
-final_rf_model = RandomForestClassifier(random_state=18)
-final_svm_model.fit(X, y)
-final_nb_model.fit(X, y)
-final_rf_model.fit(X, y)
-
-# Reading the test data
-test_data = pd.read_csv("Testing.csv").dropna(axis=1)
-
-test_X = test_data.iloc[:, :-1]
-test_Y = le.transform(test_data.iloc[:, -1])
-
-# Making prediction by take mode of predictions
-# made by all the classifiers
-svm_preds = final_svm_model.predict(test_X)
-nb_preds = final_nb_model.predict(test_X)
-rf_preds = final_rf_model.predict(test_X)
-
-final_preds = [mode([i,j,k])[0][0] for i,j,
-			k in zip(svm_preds, nb_preds, rf_preds)]
-
-print(f"Accuracy on Test dataset by the combined model\
-: {accuracy_score(test_Y, final_preds)*100}")
-
-cf_matrix = confusion_matrix(test_Y, final_preds)
-plt.figure(figsize=(12,8))
-
-sns.heatmap(cf_matrix, annot = True)
-plt.title("Confusion Matrix for Combined Model on Test Dataset")
-plt.show()
-
-symptoms = X.columns.values
-
-# Creating a symptom index dictionary to encode the
-# input symptoms into numerical form
-symptom_index = {}
-for index, value in enumerate(symptoms):
-	symptom = " ".join([i.capitalize() for i in value.split("_")])
-	symptom_index[symptom] = index
-
-data_dict = {
-	"symptom_index":symptom_index,
-	"predictions_classes":le.classes_
-}
-
-# Defining the Function
-# Input: string containing symptoms separated by commas
-# Output: Generated predictions by models
-def predictDisease(symptoms):
-    symptoms = symptoms.split(",")
-    
-    # Check if there are at least three symptoms
-    if len(symptoms) < 3:
-        return {"error": "Please enter at least three symptoms"}
-    
-    # creating input data for the models
-    input_data = [0] * len(data_dict["symptom_index"])
-    for symptom in symptoms:
-        # Check if the symptom is in the symptom_index dictionary
-        if symptom.capitalize() in data_dict["symptom_index"]:
-            index = data_dict["symptom_index"][symptom.capitalize()]
-            input_data[index] = 1
-            
-    # reshaping the input data and converting it
-    # into suitable format for model predictions
-    input_data = np.array(input_data).reshape(1,-1)
-    
-    # generating individual outputs
-    rf_prediction = data_dict["predictions_classes"][final_rf_model.predict(input_data)[0]]
-    nb_prediction = data_dict["predictions_classes"][final_nb_model.predict(input_data)[0]]
-    svm_prediction = data_dict["predictions_classes"][final_svm_model.predict(input_data)[0]]
-    
-    # making final prediction by taking mode of all predictions
-    final_prediction = mode([rf_prediction, nb_prediction, svm_prediction])[0][0]
-    predictions = [
-        data_dict["predictions_classes"][final_rf_model.predict(input_data)[0]],
-        data_dict["predictions_classes"][final_nb_model.predict(input_data)[0]],
-        data_dict["predictions_classes"][final_svm_model.predict(input_data)[0]],
-        mode([rf_prediction, nb_prediction, svm_prediction])[0][0]
-    ]
-    return final_prediction
-
-# Testing the function
-print(predictDisease("Itching,Skin Rash,Nodal Skin Eruptions"))
-
-# Save the model to a pickle file
-joblib.dump((final_rf_model, final_nb_model, final_svm_model, data_dict), "prediction.pkl")
-
-# Define the function to take input from the user and predict the disease
-def predict_from_input():
-    symptoms = input("Enter the symptoms separated by commas: ")
-    predictions = predictDisease(symptoms)
-    print("Final prediction:", predictions)
-
-# Call the function to start the prediction process
-predict_from_input()
-
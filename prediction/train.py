@@ -0,0 +1,295 @@
+# prediction/train.py
+#
+# Non-interactive training for every model the API serves.
+#
+#   python -m prediction.train                   # train what changed
+#   python -m prediction.train heart liver       # only these models
+#   python -m prediction.train --force --install # retrain all, put in service
+#
+# Cross-validation and fits run in parallel worker processes. Each run writes
+# prediction/models/<name>/<version>/ with the model file and a metrics.json
+# manifest. A model is skipped when its data, preprocessing code, features and
+# hyperparameters hash to the same fingerprint as its latest version, unless
+# --force is given.
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import cross_val_score, train_test_split
+from sklearn.naive_bayes import GaussianNB
+from sklearn.preprocessing import LabelEncoder
+from sklearn.svm import SVC
+
+PREDICTION_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(PREDICTION_DIR, "models")
+
+ESTIMATORS = {
+    "rf": RandomForestClassifier,
+    "nb": GaussianNB,
+    "svm": SVC,
+}
+
+
+def prepare_cancer(df):
+    # Convert diagnosis M/B to 1/0
+    df['diagnosis'] = LabelEncoder().fit_transform(df['diagnosis'])
+    return df
+
+
+def prepare_liver(df):
+    df['Gender'] = df['Gender'].apply(lambda x: 1 if x == 'Male' else 0)
+    # Fill NaN values with the mean of the column
+    return df.fillna(df.mean())
+
+
+def prepare_symptoms(df):
+    # The last column of Training.csv is empty
+    return df.dropna(axis=1)
+
+
+# Same data, features and settings as the original notebook exports
+TRAINING_SPECS = {
+    "symptom": {
+        "data": "Training.csv",
+        "test_data": "Testing.csv",
+        "prepare": prepare_symptoms,
+        "target": "prognosis",
+        "estimators": {"rf": {"random_state": 18}, "nb": {}, "svm": {}},
+        "split": {"test_size": 0.2, "random_state": 24},
+        "output": "prediction.pkl",
+    },
+    "cancer": {
+        "data": "cancer.csv",
+        "prepare": prepare_cancer,
+        "features": ["radius_mean", "area_mean", "perimeter_mean", "concavity_mean", "concave points_mean"],
+        "target": "diagnosis",
+        "estimators": {"rf": {}},
+        "split": {"test_size": 0.2, "random_state": 42},
+        "output": "cancer.pkl",
+    },
+    "diabetes": {
+        "data": "diabetes.csv",
+        "features": ["Pregnancies", "Glucose", "BloodPressure", "BMI", "DiabetesPedigreeFunction", "Age"],
+        "target": "Outcome",
+        "estimators": {"rf": {}},
+        "split": {"test_size": 0.2, "random_state": 42},
+        "output": "diabetes.pkl",
+    },
+    "heart": {
+        "data": "heart.csv",
+        "features": ["cp", "trestbps", "chol", "fbs", "restecg", "thalach", "exang"],
+        "target": "target",
+        "estimators": {"rf": {}},
+        "split": {"test_size": 0.2, "random_state": 42},
+        "output": "heart.pkl",
+    },
+    "liver": {
+        "data": "indian_liver_patient.csv",
+        "prepare": prepare_liver,
+        "features": ["Total_Bilirubin", "Direct_Bilirubin", "Alkaline_Phosphotase",
+                     "Alamine_Aminotransferase", "Total_Protiens", "Albumin",
+                     "Albumin_and_Globulin_Ratio"],
+        "target": "Dataset",
+        "estimators": {"rf": {}},
+        "split": {"test_size": 0.2, "random_state": 42},
+        "output": "liver.pkl",
+    },
+}
+
+
+def load_dataset(name):
+    """Return (X, y, label_encoder) for a model, prepared like at training time."""
+    spec = TRAINING_SPECS[name]
+    df = pd.read_csv(os.path.join(PREDICTION_DIR, spec["data"]))
+    if "prepare" in spec:
+        df = spec["prepare"](df)
+    if "features" in spec:
+        return df[spec["features"]], df[spec["target"]], None
+
+    le = LabelEncoder()
+    y = pd.Series(le.fit_transform(df[spec["target"]]), index=df.index)
+    return df.drop(columns=[spec["target"]]), y, le
+
+
+def holdout_split(name):
+    X, y, le = load_dataset(name)
+    return train_test_split(X, y, **TRAINING_SPECS[name]["split"])
+
+
+def fingerprint(name, cv):
+    spec = TRAINING_SPECS[name]
+    digest = hashlib.sha256()
+    for filename in (spec["data"], spec.get("test_data")):
+        if filename:
+            with open(os.path.join(PREDICTION_DIR, filename), 'rb') as file:
+                digest.update(file.read())
+    settings = {key: value for key, value in spec.items() if key != "prepare"}
+    # The preprocessing code itself, so editing it retrains the model
+    settings["prepare"] = inspect.getsource(spec["prepare"]) if "prepare" in spec else None
+    settings["load_dataset"] = inspect.getsource(load_dataset)
+    settings["cv"] = cv
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def latest_manifest(name):
+    path = os.path.join(MODELS_DIR, name, "latest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def train_estimator(name, key, cv):
+    """Cross-validate and fit one estimator; runs in a worker process."""
+    spec = TRAINING_SPECS[name]
+    params = spec["estimators"][key]
+    start = time.perf_counter()
+    X, y, le = load_dataset(name)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, **spec["split"])
+
+    scores = cross_val_score(ESTIMATORS[key](**params), X, y, cv=cv, scoring="accuracy")
+
+    model = ESTIMATORS[key](**params)
+    model.fit(X_train, y_train)
+    metrics = {
+        "cv_scores": scores.tolist(),
+        "cv_mean": float(np.mean(scores)),
+        "cv_std": float(np.std(scores)),
+        "train_accuracy": accuracy_score(y_train, model.predict(X_train)),
+        "holdout_accuracy": accuracy_score(y_test, model.predict(X_test)),
+    }
+    if "test_data" in spec:
+        # The ensemble is served trained on the whole data set
+        model = ESTIMATORS[key](**params)
+        model.fit(X, y)
+    metrics["seconds"] = time.perf_counter() - start
+    return name, key, model, metrics
+
+
+def ensemble_test_accuracy(models, le):
+    from utils.model_registry import majority_vote
+
+    test_data = pd.read_csv(os.path.join(PREDICTION_DIR, TRAINING_SPECS["symptom"]["test_data"])).dropna(axis=1)
+    test_X = test_data.iloc[:, :-1]
+    test_Y = le.transform(test_data.iloc[:, -1])
+    votes = majority_vote(models["rf"].predict(test_X), models["nb"].predict(test_X), models["svm"].predict(test_X))
+    return accuracy_score(test_Y, votes)
+
+
+def save_version(name, models, metrics, version_fingerprint, cv):
+    spec = TRAINING_SPECS[name]
+    version = datetime.utcnow().strftime("%Y%m%d%H%M%S") + "-" + version_fingerprint[:8]
+    version_dir = os.path.join(MODELS_DIR, name, version)
+    os.makedirs(version_dir, exist_ok=True)
+    model_path = os.path.join(version_dir, spec["output"])
+
+    manifest = {
+        "name": name,
+        "version": version,
+        "fingerprint": version_fingerprint,
+        "created_at": datetime.utcnow().isoformat(),
+        "sklearn_version": sklearn.__version__,
+        "data": spec["data"],
+        "features": spec.get("features"),
+        "estimators": spec["estimators"],
+        "split": spec["split"],
+        "cv": cv,
+        "metrics": metrics,
+        "model": spec["output"],
+    }
+
+    if name == "symptom":
+        X, y, le = load_dataset(name)
+        # Creating a symptom index dictionary to encode the
+        # input symptoms into numerical form
+        symptom_index = {}
+        for index, value in enumerate(X.columns.values):
+            symptom = " ".join([i.capitalize() for i in value.split("_")])
+            symptom_index[symptom] = index
+        data_dict = {
+            "symptom_index": symptom_index,
+            "predictions_classes": le.classes_
+        }
+        manifest["metrics"]["ensemble_test_accuracy"] = ensemble_test_accuracy(models, le)
+        joblib.dump((models["rf"], models["nb"], models["svm"], data_dict), model_path)
+    else:
+        with open(model_path, 'wb') as file:
+            pickle.dump(models["rf"], file)
+
+    with open(os.path.join(version_dir, "metrics.json"), "w") as file:
+        json.dump(manifest, file, indent=2)
+    with open(os.path.join(MODELS_DIR, name, "latest.json"), "w") as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+def install(manifest):
+    # Copy next to the served file and rename, so a reload never reads a
+    # partially written artifact
+    source = os.path.join(MODELS_DIR, manifest["name"], manifest["version"], manifest["model"])
+    target = os.path.join(PREDICTION_DIR, manifest["model"])
+    shutil.copyfile(source, target + ".tmp")
+    os.replace(target + ".tmp", target)
+    print(f"Installed {manifest['name']} {manifest['version']} -> {target}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the prediction models")
+    parser.add_argument("models", nargs="*", help=f"models to train (default: all of {', '.join(TRAINING_SPECS)})")
+    parser.add_argument("--cv", type=int, default=10, help="cross-validation folds")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--force", action="store_true", help="retrain even if nothing changed")
+    parser.add_argument("--install", action="store_true", help="replace the served model files")
+    args = parser.parse_args(argv)
+
+    names = args.models or list(TRAINING_SPECS)
+    unknown = [name for name in names if name not in TRAINING_SPECS]
+    if unknown:
+        parser.error(f"unknown models: {', '.join(unknown)}")
+
+    fingerprints = {}
+    for name in names:
+        fingerprints[name] = fingerprint(name, args.cv)
+        latest = latest_manifest(name)
+        if not args.force and latest and latest["fingerprint"] == fingerprints[name]:
+            print(f"Skipping {name}: unchanged since {latest['version']}")
+            del fingerprints[name]
+
+    # One task per estimator, so the three ensemble members train in parallel too
+    tasks = [(name, key) for name in fingerprints for key in TRAINING_SPECS[name]["estimators"]]
+    results = {name: ({}, {}) for name in fingerprints}
+    if tasks:
+        with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(tasks)))) as pool:
+            futures = [pool.submit(train_estimator, name, key, args.cv) for name, key in tasks]
+            for future in futures:
+                name, key, model, metrics = future.result()
+                results[name][0][key] = model
+                results[name][1][key] = metrics
+                print(f"Trained {name}/{key}: cv {metrics['cv_mean']:.4f}, holdout {metrics['holdout_accuracy']:.4f}")
+
+    for name, (models, metrics) in results.items():
+        manifest = save_version(name, models, metrics, fingerprints[name], args.cv)
+        print(f"Saved {name} {manifest['version']}")
+        if args.install:
+            install(manifest)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
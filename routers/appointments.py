@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pymongo import MongoClient
 from bson import json_util, ObjectId
-from database import get_database
+from database import AsyncDatabase
 from pydantic import BaseModel
 import json
 from bson.json_util import dumps
@@ -13,8 +13,8 @@ from bson.json_util import default
 
 router = APIRouter()
 
-# Connect to MongoDB
-db = get_database()
+# MongoDB collections, the client is opened in the app lifespan
+db = AsyncDatabase()
 users_collection = db["users"]
 doctors_collection = db["doctors"]
 appointments_collection = db["appointments"]
@@ -32,16 +32,16 @@ class Appointment(BaseModel):
 @router.post("/appointments")
 async def book_appointment(appointment: Appointment):
     # Check if the user and doctor exist
-    user = users_collection.find_one({"_id": ObjectId(appointment.user_id)})
+    user = await users_collection.find_one({"_id": ObjectId(appointment.user_id)})
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    doctor = doctors_collection.find_one({"_id": ObjectId(appointment.doctor_id)})
+    doctor = await doctors_collection.find_one({"_id": ObjectId(appointment.doctor_id)})
     if doctor is None:
         raise HTTPException(status_code=404, detail="Doctor not found")
 
     # Check if the appointment time is available
-    existing_appointment = appointments_collection.find_one({
+    existing_appointment = await appointments_collection.find_one({
         "doctor_id": ObjectId(appointment.doctor_id),
         "appointment_time": appointment.appointment_time
     })
@@ -49,7 +49,7 @@ async def book_appointment(appointment: Appointment):
         raise HTTPException(status_code=400, detail="Appointment time not available")
 
     # Check if the doctor has any other appointments in the given time
-    conflicting_appointments_count = appointments_collection.count_documents({
+    conflicting_appointments_count = await appointments_collection.count_documents({
         "doctor_id": ObjectId(appointment.doctor_id),
         "appointment_time": appointment.appointment_time
     })
@@ -60,7 +60,7 @@ async def book_appointment(appointment: Appointment):
     appointment_dict = appointment.dict()
     appointment_dict['doctor_id'] = ObjectId(appointment.doctor_id)
     appointment_dict['user_id'] = ObjectId(appointment.user_id)
-    result = appointments_collection.insert_one(appointment_dict)
+    result = await appointments_collection.insert_one(appointment_dict)
 
     return {"message": "Appointment booked successfully"}
 
@@ -68,7 +68,7 @@ async def book_appointment(appointment: Appointment):
 
 @router.get("/appointments")
 async def list_appointments():
-    appointments = appointments_collection.find()
+    appointments = await appointments_collection.find()
     return json.loads(json_util.dumps(appointments))  # Convert BSON to JSON
 
 @router.patch("/appointments/{appointment_id}")
@@ -77,19 +77,19 @@ async def edit_appointment(payload: dict):
     new_appointment_time = payload["new_appointment_time"]
     new_notes = payload["new_notes"]
     
-    appointment = appointments_collection.find_one({"_id": ObjectId(appointment_id)})
+    appointment = await appointments_collection.find_one({"_id": ObjectId(appointment_id)})
     if appointment is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
     # Check if the new appointment time is available
-    existing_appointment = appointments_collection.find_one({
+    existing_appointment = await appointments_collection.find_one({
         "doctor_id": appointment['doctor_id'],
         "appointment_time": new_appointment_time
     })
     if existing_appointment is not None:
         raise HTTPException(status_code=400, detail="Appointment time not available")
 
-    result = appointments_collection.update_one(
+    result = await appointments_collection.update_one(
         {"_id": ObjectId(appointment_id)}, 
         {"$set": {"appointment_time": new_appointment_time, "notes": new_notes}}
     )
@@ -99,7 +99,7 @@ async def edit_appointment(payload: dict):
 
 @router.delete("/appointments/{appointment_id}")
 async def delete_appointment(appointment_id: str):
-    result = appointments_collection.delete_one({"_id": ObjectId(appointment_id)})
+    result = await appointments_collection.delete_one({"_id": ObjectId(appointment_id)})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
@@ -109,7 +109,7 @@ async def delete_appointment(appointment_id: str):
 async def accept_appointment(
     appointment_id: str,
 ):
-    appointment = appointments_collection.find_one({"_id": ObjectId(appointment_id)})
+    appointment = await appointments_collection.find_one({"_id": ObjectId(appointment_id)})
     if appointment is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
@@ -118,12 +118,12 @@ async def accept_appointment(
 
     # Generate a chat room ID and save it to the appointment object
     room_id = str(uuid.uuid4())
-    appointments_collection.update_one({"_id": ObjectId(appointment_id)}, {"$set": {"status": "accepted", "room_id": room_id}})
+    await appointments_collection.update_one({"_id": ObjectId(appointment_id)}, {"$set": {"status": "accepted", "room_id": room_id}})
 
     # Create a new chat room for the appointment
-    chats_collection = get_database()["chats"]
+    chats_collection = db["chats"]
     chat = {"room_id": room_id, "user_id": appointment["user_id"], "doctor_id": appointment["doctor_id"], "messages": []}
-    chats_collection.insert_one(chat)
+    await chats_collection.insert_one(chat)
 
     return {"message": "Appointment accepted successfully"}
 
@@ -132,14 +132,14 @@ async def accept_appointment(
 async def reject_appointment(
     appointment_id: str,
 ):
-    appointment = appointments_collection.find_one({"_id": ObjectId(appointment_id)})
+    appointment = await appointments_collection.find_one({"_id": ObjectId(appointment_id)})
     if appointment is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
     if appointment["status"] != "pending":
         raise HTTPException(status_code=400, detail="Invalid operation: appointment has already been processed")
 
-    appointments_collection.update_one({"_id": ObjectId(appointment_id)}, {"$set": {"status": "rejected"}})
+    await appointments_collection.update_one({"_id": ObjectId(appointment_id)}, {"$set": {"status": "rejected"}})
 
     return {"message": "Appointment rejected successfully"}
 
@@ -147,11 +147,11 @@ async def reject_appointment(
 
 @router.get("/appointments/{doctor_id}")
 async def list_appointments_by_doctor(doctor_id: str):
-    doctor = doctors_collection.find_one({"_id": ObjectId(doctor_id)})
+    doctor = await doctors_collection.find_one({"_id": ObjectId(doctor_id)})
     if doctor is None:
         raise HTTPException(status_code=404, detail="Doctor not found")
 
-    appointments = appointments_collection.find({"doctor_id": ObjectId(doctor_id)})
+    appointments = await appointments_collection.find({"doctor_id": ObjectId(doctor_id)})
     appointments = json.loads(dumps(appointments))  # Convert BSON to JSON
     for appointment in appointments:
         appointment["_id"] = str(appointment["_id"]["$oid"])
@@ -165,21 +165,21 @@ async def list_appointments_by_doctor(doctor_id: str):
 
 @router.get("/appointments/by-doctor/{doctor_id}")
 async def get_appointments_by_doctor(doctor_id: str):
-    doctor = doctors_collection.find_one({"_id": ObjectId(doctor_id)})
+    doctor = await doctors_collection.find_one({"_id": ObjectId(doctor_id)})
     if doctor is None:
         raise HTTPException(status_code=404, detail="Doctor not found")
 
-    appointments = appointments_collection.find({"doctor_id": ObjectId(doctor_id)})
+    appointments = await appointments_collection.find({"doctor_id": ObjectId(doctor_id)})
     return json.loads(json_util.dumps(appointments))  # Convert BSON to JSON
 
 
 @router.get("/appointments/by-user/{user_id}")
 async def get_appointments_by_user(user_id: str):
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await users_collection.find_one({"_id": ObjectId(user_id)})
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    appointments = appointments_collection.find({"user_id": ObjectId(user_id)})
+    appointments = await appointments_collection.find({"user_id": ObjectId(user_id)})
     appointments = json.loads(json_util.dumps(appointments))  # Convert BSON to JSON
     for appointment in appointments:
             appointment["_id"] = str(appointment["_id"]["$oid"])
@@ -193,11 +193,11 @@ async def get_appointments_by_user(user_id: str):
 
 @router.get("/appointments/by-status-user/{user_id}")
 async def get_appointments_by_user(user_id: str):
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await users_collection.find_one({"_id": ObjectId(user_id)})
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    appointments = appointments_collection.find({
+    appointments = await appointments_collection.find({
         "user_id": ObjectId(user_id),
         "status": "accepted"
     })
@@ -214,11 +214,11 @@ async def get_appointments_by_user(user_id: str):
 
 @router.get("/appointments/by-status-doctor/{doctor_id}")
 async def get_appointments_by_doctor_status(doctor_id: str):
-    doctor = doctors_collection.find_one({"_id": ObjectId(doctor_id)})
+    doctor = await doctors_collection.find_one({"_id": ObjectId(doctor_id)})
     if doctor is None:
         raise HTTPException(status_code=404, detail="Doctor not found")
 
-    appointments = appointments_collection.find({
+    appointments = await appointments_collection.find({
         "doctor_id": ObjectId(doctor_id),
         "status": "accepted"
     })
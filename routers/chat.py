@@ -2,12 +2,11 @@
 
 from fastapi import APIRouter, Depends, HTTPException,File, UploadFile
 from fastapi.responses import StreamingResponse
-from gridfs import GridFS
 from gridfs.errors import NoFile
 from typing import List
 from pydantic import BaseModel
 from bson.objectid import ObjectId
-from database import get_database
+from database import AsyncDatabase
 from pymongo import MongoClient
 from bson import json_util
 from bson import ObjectId
@@ -21,6 +20,8 @@ import datetime
 
 router = APIRouter()
 
+db = AsyncDatabase()
+
 class Message(BaseModel):
     sender_id: str
     content: str
@@ -43,10 +44,10 @@ class CustomJSONEncoder(json.JSONEncoder):
 
 
 @router.post("/chat/{room_id}/send")
-async def send_message(room_id: str, message: Message, sender_id: str, db: MongoClient = Depends(get_database)):
+async def send_message(room_id: str, message: Message, sender_id: str):
     chats_collection = db["chats"]
 
-    chat = chats_collection.find_one({"room_id": room_id})
+    chat = await chats_collection.find_one({"room_id": room_id})
     if not chat:
         raise HTTPException(status_code=404, detail="Chat room not found")
 
@@ -60,7 +61,7 @@ async def send_message(room_id: str, message: Message, sender_id: str, db: Mongo
     message_dict['sender_id'] = ObjectId(sender_id)
     message_dict['message_id'] = message_id
 
-    chats_collection.update_one(
+    await chats_collection.update_one(
         {"room_id": room_id},
         {"$push": {"messages": message_dict}}
     )
@@ -72,7 +73,7 @@ async def send_message(room_id: str, message: Message, sender_id: str, db: Mongo
 
 
 @router.get("/{room_id}/messages")
-async def get_messages(room_id: str, db: MongoClient = Depends(get_database)):
+async def get_messages(room_id: str):
     chats_collection = db["chats"]
     users_collection = db["users"]
     doctors_collection = db["doctors"]
@@ -102,7 +103,7 @@ async def get_messages(room_id: str, db: MongoClient = Depends(get_database)):
         }}
     ]
 
-    messages = chats_collection.aggregate(pipeline)
+    messages = await chats_collection.aggregate(pipeline)
     messages = json.loads(json_util.dumps(messages))
     formatted_messages = []
     for message in messages:
@@ -129,10 +130,10 @@ async def get_messages(room_id: str, db: MongoClient = Depends(get_database)):
 
 
 @router.delete("/chat/{room_id}/message/{message_id}")
-async def delete_message(room_id: str, message_id: str, db: MongoClient = Depends(get_database)):
+async def delete_message(room_id: str, message_id: str):
     chats_collection = db["chats"]
 
-    result = chats_collection.update_one({"room_id": room_id}, {"$pull": {"messages": {"message_id": message_id}}})
+    result = await chats_collection.update_one({"room_id": room_id}, {"$pull": {"messages": {"message_id": message_id}}})
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Message not found")
 
@@ -141,15 +142,15 @@ async def delete_message(room_id: str, message_id: str, db: MongoClient = Depend
 
 
 @router.post("/chat/{room_id}/send-file")
-async def send_file(room_id: str, sender_id: str, file: UploadFile = File(...), db: MongoClient = Depends(get_database)):
+async def send_file(room_id: str, sender_id: str, file: UploadFile = File(...)):
     chats_collection = db["chats"]
-    chat = chats_collection.find_one({"room_id": room_id})
+    chat = await chats_collection.find_one({"room_id": room_id})
 
     if not chat:
         raise HTTPException(status_code=404, detail="Chat room not found")
 
-    fs = GridFS(db)
-    file_id = fs.put(await file.read(), filename=file.filename, content_type=file.content_type)
+    fs = db.gridfs
+    file_id = await fs.put(await file.read(), filename=file.filename, content_type=file.content_type)
 
     message = {
         "sender_id": ObjectId(sender_id),
@@ -159,43 +160,43 @@ async def send_file(room_id: str, sender_id: str, file: UploadFile = File(...),
         "timestamp": datetime.datetime.utcnow(),
     }
 
-    chats_collection.update_one({"room_id": room_id}, {"$push": {"messages": message}})
+    await chats_collection.update_one({"room_id": room_id}, {"$push": {"messages": message}})
     return {"message": "File sent"}
 
 
 @router.get("/chat/{room_id}/download-file/{file_id}")
-async def download_file(room_id: str, file_id: str, db: MongoClient = Depends(get_database)):
+async def download_file(room_id: str, file_id: str):
     chats_collection = db["chats"]
-    chat = chats_collection.find_one({"room_id": room_id})
+    chat = await chats_collection.find_one({"room_id": room_id})
 
     if not chat:
         raise HTTPException(status_code=404, detail="Chat room not found")
 
-    fs = GridFS(db)
+    fs = db.gridfs
 
     try:
-        file = fs.get(ObjectId(file_id))
+        file = await fs.get(ObjectId(file_id))
     except NoFile:
         raise HTTPException(status_code=404, detail="File not found")
 
-    return StreamingResponse(file, media_type=file.content_type, headers={"Content-Disposition": f"attachment; filename={file.filename}"})
+    return StreamingResponse(fs.stream(file), media_type=file.content_type, headers={"Content-Disposition": f"attachment; filename={file.filename}"})
 
 @router.delete("/chat/{room_id}/delete-file/{file_id}")
-async def delete_file(room_id: str, file_id: str, db: MongoClient = Depends(get_database)):
+async def delete_file(room_id: str, file_id: str):
     chats_collection = db["chats"]
-    chat = chats_collection.find_one({"room_id": room_id})
+    chat = await chats_collection.find_one({"room_id": room_id})
 
     if not chat:
         raise HTTPException(status_code=404, detail="Chat room not found")
 
-    fs = GridFS(db)
+    fs = db.gridfs
 
     try:
-        fs.delete(ObjectId(file_id))
+        await fs.delete(ObjectId(file_id))
     except NoFile:
         raise HTTPException(status_code=404, detail="File not found")
 
     # Remove the file reference from the chat room's messages
-    chats_collection.update_one({"room_id": room_id}, {"$pull": {"messages": {"file_id": ObjectId(file_id)}}})
+    await chats_collection.update_one({"room_id": room_id}, {"$pull": {"messages": {"file_id": ObjectId(file_id)}}})
 
     return {"message": "File deleted"}
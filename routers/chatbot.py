@@ -1,32 +1,59 @@
 # routers/chatbot.py
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from typing import Dict, List, Optional, Tuple
 from pydantic import BaseModel
-from geopy.distance import geodesic
 from dotenv import load_dotenv
 from utils.email import send_email
+import asyncio
 import os
-import openai
-from database import get_database
+import socket
+import uuid
+from datetime import datetime
+from functools import partial
+from database import AsyncCollection, LazyCollection, run_db
 import pymongo
 
-from scipy.stats import mode
-import joblib
+from utils.autocomplete import symptom_autocomplete
+from utils.counters import DiseaseCounters
+from utils.cache import SingleFlight, TTLCache
+from utils.inference import predict, predict_batch
+from utils.llm import LLMUnavailable, llm_client
+from utils.model_registry import registry
+from utils.outbreak import OutbreakMonitor, analyze_outbreaks, rem_dup_loc
+from utils.sketches import CaseSketches
+from utils.symptom_lookup import SymptomLookup, pack_rows
+from utils.symptoms import normalize_symptom, split_symptoms, symptom_encoder
 
 router = APIRouter()
 
-# Load the saved models and data dictionary
-final_rf_model, final_nb_model, final_svm_model, data_dict = joblib.load(
-    "prediction/prediction.pkl")
+# Identifies this process in documents shared by every instance
+PROCESS_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
 
 load_dotenv()
-openai.api_key = os.environ.get("OPENAI_API_KEY")
+AUTOCOMPLETE_MAX_AGE = int(os.environ.get("AUTOCOMPLETE_MAX_AGE", "3600"))
 
-# Connect to MongoDB
-db = get_database()
-collection = db["predictions"]
+# MongoDB collections, the client is opened in the app lifespan
+collection = LazyCollection("predictions")
+# Request handlers await this; the background jobs use the collection directly
+predictions = AsyncCollection(collection)
+
+# The served ensemble's answers for every symptom combination in the
+# training data, built whenever the symptom model is (re)loaded
+symptom_lookup = SymptomLookup({}, 0)
+
+
+def rebuild_symptom_lookup(name, entry):
+    global symptom_lookup
+    if name == "symptom":
+        # Never answer with the previous model's table if building fails
+        symptom_lookup = SymptomLookup({}, 0)
+        symptom_lookup = SymptomLookup.from_ensemble(entry.model)
+
+
+registry.add_listener(rebuild_symptom_lookup)
 
 
 class UserMessage(BaseModel):
@@ -42,99 +69,141 @@ class DiseasePrediction(BaseModel):
     location: dict
 
 
+# Largest /predict/batch request, kept under the inference queue bound
+PREDICT_BATCH_MAX_ITEMS = int(os.environ.get("PREDICT_BATCH_MAX_ITEMS", "256"))
+
+
+class SymptomBatch(BaseModel):
+    symptoms: List[str]
+
+
 PROMPT = """Given the following symptoms, predict the most likely disease.
     
 Symptoms:
 {}
     
 Disease prediction:"""
+# Bump when PROMPT or the completion settings change, so cached answers
+# to the old prompt are not served
+PROMPT_VERSION = "1"
 
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "5000"))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", "86400"))
+llm_cache = TTLCache(LLM_CACHE_SIZE, LLM_CACHE_TTL)
+# Identical prompts in flight at the same time share one upstream call
+llm_calls = SingleFlight()
 
-def generate_prediction(symptoms):
-    if len(symptoms) < 3:
-        raise HTTPException(
-            status_code=400, detail="Please provide at least three symptoms.")
 
+async def complete_symptoms(symptoms: Tuple[str, ...]) -> str:
     # Format the prompt with the provided symptoms
     formatted_symptoms = "\n".join(symptoms)
     prompt = PROMPT.format(formatted_symptoms)
 
     # Generate prediction using OpenAI
-    response = openai.Completion.create(
-        model="text-davinci-003",
-        prompt=prompt,
+    prediction = await llm_client.complete(
+        prompt,
         temperature=0.3,
         max_tokens=60,
         top_p=1.0,
         frequency_penalty=0.5,
         presence_penalty=0.0,
     )
-
-    # Parse response and return prediction
-    prediction = response.choices[0].text.strip()
+    llm_cache.set((PROMPT_VERSION, symptoms), prediction)
     return prediction
 
 
-def check_outbreak(count_threshold: int, location_threshold: int) -> Optional[Tuple[str, List[dict]]]:
-    pipeline = [
-        {"$group": {"_id": "$prediction", "count": {
-            "$sum": 1}, "location": {"$push": "$location"}}}
-    ]
-    count_results = collection.aggregate(pipeline)
-    disease_counts = [{"id": result["_id"], "count":result["count"],
-                       "location":result["location"]} for result in count_results]
-    for ele in disease_counts:
-        loc = locality(ele["location"])
-        if ele["count"] >= count_threshold and len(loc) >= location_threshold and infective_disease(ele["id"]):
-            return ele["id"], loc
-    return None
-
-
-def locality(locations: List[Dict[str, float]]) -> List[Dict[str, float]]:
-    threshold_km = 10.0
-
-    nearby_locations = []
-
-    for i in range(len(locations)):
-        current_location = locations[i]
-        lat1, lon1 = current_location["latitude"], current_location["longitude"]
-
-        for j in range(i+1, len(locations)):
-            compare_location = locations[j]
-            lat2, lon2 = compare_location["latitude"], compare_location["longitude"]
-
-            distance_km = geodesic((lat1, lon1), (lat2, lon2)).kilometers
-
-            if distance_km <= threshold_km:
-                nearby_locations.append(current_location)
-                nearby_locations.append(compare_location)
-
-    return nearby_locations
-
-
-def infective_disease(dis: str) -> bool:
-    dis_index = ["fungus", "fungal", "flu", "bacteria",
-                 "bacterial", "virus", "viral", "corona", "covid"]
-    for di in dis_index:
-        if di in dis:
-            return True
-
-    return False
-
-
-def rem_dup_loc(locations: List[Dict[str, float]]) -> List[Dict[str, float]]:
-    unique_locations = []
-    unique_coordinates = set()
-
-    for location in locations:
-        lat, lon = location["latitude"], location["longitude"]
-        coordinate = (lat, lon)
-
-        if coordinate not in unique_coordinates:
-            unique_locations.append(location)
-            unique_coordinates.add(coordinate)
+async def generate_prediction(symptoms) -> Tuple[str, str]:
+    if len(symptoms) < 3:
+        raise HTTPException(
+            status_code=400, detail="Please provide at least three symptoms.")
 
-    return unique_locations
+    # The order and spelling of the symptoms do not change the answer
+    canonical = tuple(sorted({normalize_symptom(symptom) for symptom in symptoms}))
+    found, prediction = llm_cache.get((PROMPT_VERSION, canonical))
+    if found:
+        return prediction, "cache"
+    try:
+        prediction = await llm_calls.do((PROMPT_VERSION, canonical), partial(complete_symptoms, canonical))
+        return prediction, "llm"
+    except LLMUnavailable as exc:
+        print(f"LLM unavailable ({exc}), using the local models")
+
+    # Fall back to the symptom ensemble, these answers are not cached
+    X, unknown = symptom_encoder().encode([symptoms])
+    return (await diagnose(X))[0], "local"
+
+
+# Outbreaks are evaluated by a background job over these windows instead of
+# on every request
+OUTBREAK_WINDOWS_HOURS = [float(hours) for hours in os.environ.get("OUTBREAK_WINDOWS_HOURS", "24,168").split(",")]
+# Seconds between outbreak checks, 0 disables them in this process
+OUTBREAK_CHECK_SECONDS = float(os.environ.get("OUTBREAK_CHECK_SECONDS", "300"))
+OUTBREAK_ALERT_COOLDOWN_HOURS = float(os.environ.get("OUTBREAK_ALERT_COOLDOWN_HOURS", "24"))
+outbreaks_collection = LazyCollection("outbreaks")
+outbreaks = AsyncCollection(outbreaks_collection)
+# Side of the grid cells, in degrees, that region counts are kept for
+DISEASE_REGION_DEGREES = float(os.environ.get("DISEASE_REGION_DEGREES", "1.0"))
+disease_counters = DiseaseCounters(LazyCollection("disease_counters"), region_degrees=DISEASE_REGION_DEGREES)
+BACKFILL_RETRY_SECONDS = float(os.environ.get("BACKFILL_RETRY_SECONDS", "60"))
+
+
+# Fixed-memory case counts by disease, place and hour for surveillance queries
+case_sketches = CaseSketches(
+    cell_degrees=float(os.environ.get("SKETCH_CELL_DEGREES", "0.1")),
+    retention_hours=int(os.environ.get("SKETCH_RETENTION_HOURS", "168")),
+    width=int(os.environ.get("SKETCH_WIDTH", "2048")),
+    depth=int(os.environ.get("SKETCH_DEPTH", "4")),
+    capacity=int(os.environ.get("SKETCH_HEAVY_HITTERS", "100")),
+)
+sketches_collection = AsyncCollection(LazyCollection("case_sketches"))
+
+
+async def restore_case_sketches():
+    # Every process saves its own documents; a starting process claims the
+    # ones left by stopped processes, so each count is restored only once
+    await sketches_collection.update_many({"claimed_by": None}, {"$set": {"claimed_by": PROCESS_ID}})
+    try:
+        documents = await sketches_collection.find({"claimed_by": PROCESS_ID})
+    except Exception:
+        await sketches_collection.update_many({"claimed_by": PROCESS_ID}, {"$unset": {"claimed_by": ""}})
+        raise
+    # Read on the database threads, added on the event loop like every case
+    case_sketches.restore(documents)
+    await sketches_collection.delete_many({"claimed_by": PROCESS_ID})
+
+
+async def save_case_sketches():
+    # Only this process's documents are written, other processes' stay
+    documents = [{"_id": f"{PROCESS_ID}:{document['hour']}", "process": PROCESS_ID, **document}
+                 for document in case_sketches.snapshot()]
+    if documents:
+        await sketches_collection.bulk_write(
+            [pymongo.ReplaceOne({"_id": document["_id"]}, document, upsert=True) for document in documents])
+
+
+async def backfill_disease_counters(started: datetime):
+    # Counts the predictions stored before any instance ran record(); runs
+    # until the backfill is complete, here or in another instance
+    while True:
+        try:
+            if not await run_db(disease_counters.start_backfill, started):
+                return
+            counted = 0
+            while True:
+                read = await run_db(disease_counters.backfill_batch, collection, PROCESS_ID)
+                if not read:
+                    break
+                counted += read
+            if counted:
+                print(f"Backfilled disease counters from {counted} predictions")
+            if read == 0:
+                return
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            print(f"Disease counter backfill failed: {exc}")
+        # Another instance holds it, or it failed; its progress is kept
+        await asyncio.sleep(BACKFILL_RETRY_SECONDS)
 
 
 def send_outbreak_mail(outbreak_res: Tuple[str, List[dict]]):
@@ -145,32 +214,71 @@ def send_outbreak_mail(outbreak_res: Tuple[str, List[dict]]):
                f"{outbreak_res[0]} Outbreak", f"Outbreak of {outbreak_res[0]} in \nlocality : {loc_fmt}")
 
 
+outbreak_monitor = OutbreakMonitor(
+    collection, outbreaks_collection, LazyCollection("outbreak_alerts"), send_outbreak_mail,
+    windows_hours=OUTBREAK_WINDOWS_HOURS, interval=OUTBREAK_CHECK_SECONDS,
+    cooldown_hours=OUTBREAK_ALERT_COOLDOWN_HOURS,
+    distance_km=10.0, count_threshold=3, location_threshold=2,
+)
+
+
 @router.post("/disease-prediction")
 async def disease_prediction(disease_prediction: DiseasePrediction):
     symptoms = disease_prediction.symptoms
-    prediction = generate_prediction(symptoms)
+    prediction, source = await generate_prediction(symptoms)
 
     # Save prediction and location in MongoDB
     record = {
         "symptoms": symptoms,
         "prediction": prediction,
-        "location": disease_prediction.location
+        "location": disease_prediction.location,
+        "created_at": datetime.utcnow(),
     }
-    record_id = 0
-    # result = collection.insert_one(record)
-    # record_id = str(result.inserted_id)
-    # Calculate count of disease predictions
-    pipeline = [
-        {"$group": {"_id": "$prediction", "count": {"$sum": 1}}}
-    ]
-    count_results = collection.aggregate(pipeline)
-    disease_counts = {result["_id"]: result["count"]
-                      for result in count_results}
-    res = check_outbreak(count_threshold=3, location_threshold=2)
-    if res:
-        print(f"Outbreak of {res[0]} detected")
-        send_outbreak_mail(res)
-    return {"disease_prediction": prediction, "record_id": record_id, "disease_counts": disease_counts}
+    result = await predictions.insert_one(record)
+    record_id = str(result.inserted_id)
+    await run_db(disease_counters.record, prediction, record["location"], record["created_at"])
+    case_sketches.add(prediction, record["location"], record["created_at"])
+    disease_counts = await run_db(disease_counters.counts)
+    return {"disease_prediction": prediction, "source": source, "record_id": record_id, "disease_counts": disease_counts}
+
+
+@router.get("/disease-counts")
+async def get_disease_counts(day: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+                             region: Optional[str] = Query(None, pattern=r"^-?\d+:-?\d+$")):
+    # Precomputed totals, optionally for one day (YYYY-MM-DD) and/or region cell
+    return await run_db(disease_counters.counts, day=day, region=region)
+
+
+@router.get("/surveillance/cases")
+async def surveillance_cases(disease: str, latitude: float = Query(..., ge=-90, le=90),
+                             longitude: float = Query(..., ge=-180, le=180),
+                             hours: int = Query(24, ge=1), neighbours: bool = True):
+    hours = min(hours, case_sketches.retention_hours)
+    location = {"latitude": latitude, "longitude": longitude}
+    return {"hours": hours, **case_sketches.count(disease, location, hours, neighbours=neighbours)}
+
+
+@router.get("/surveillance/top")
+async def surveillance_top(hours: int = Query(24, ge=1), limit: int = Query(10, ge=1, le=100)):
+    hours = min(hours, case_sketches.retention_hours)
+    return {"hours": hours, "heavy_hitters": case_sketches.heavy_hitters(hours, limit)}
+
+
+@router.get("/outbreaks")
+async def list_outbreaks(status: str = "active", limit: int = Query(100, ge=1, le=1000)):
+    found = await outbreaks.find({"status": status}, sort=[("detected_at", -1)], limit=limit)
+    return [{**outbreak, "_id": str(outbreak["_id"])} for outbreak in found]
+
+
+@router.get("/outbreaks/clusters")
+async def outbreak_clusters(disease: Optional[str] = None, radius_km: float = Query(10.0, gt=0, le=500),
+                            min_samples: int = Query(3, ge=2), infective_only: bool = True):
+    # Batch analysis over all stored predictions, off the event loop
+    query = {"prediction": disease} if disease else {}
+    records = await predictions.find(query, {"prediction": 1, "location": 1, "_id": 0})
+    analyze = partial(analyze_outbreaks, records, radius_km=radius_km, min_samples=min_samples,
+                      infective_only=infective_only)
+    return {"clusters": await run_in_threadpool(analyze)}
 
 
 @router.post("/chatbot/message", response_model=BotResponse)
@@ -190,31 +298,77 @@ def process_message(user_input: str) -> str:
 # Define the predict endpoint
 
 
+@router.get("/predict/stats")
+async def predict_stats():
+    return {
+        **symptom_lookup.stats(),
+        "llm": {**llm_client.stats(), "in_flight": len(llm_calls)},
+        "llm_cache": llm_cache.stats(),
+    }
+
+
+@router.get("/symptoms/autocomplete")
+async def autocomplete_symptoms(response: Response, q: str = Query(..., max_length=100),
+                                limit: int = Query(10, ge=1, le=50)):
+    suggestions = symptom_autocomplete().complete(q, limit)
+    # Suggestions only change when the symptom model is reloaded
+    response.headers["Cache-Control"] = f"public, max-age={AUTOCOMPLETE_MAX_AGE}"
+    response.headers["ETag"] = f'"{registry.entry("symptom").version}"'
+    return {"query": q, "suggestions": list(suggestions)}
+
+
+async def diagnose(X) -> List[str]:
+    # Known symptom combinations come from the lookup table, only the rest
+    # go through the models
+    diseases = [None] * len(X)
+    if symptom_lookup.n_symptoms == X.shape[1]:
+        diseases = [symptom_lookup.get(key) for key in pack_rows(X)]
+    unseen = [i for i, disease in enumerate(diseases) if disease is None]
+    if len(unseen) == 1:
+        diseases[unseen[0]] = str(await predict("symptom", X[unseen[0]]))
+    elif unseen:
+        for i, disease in zip(unseen, await predict_batch("symptom", X[unseen])):
+            diseases[i] = str(disease)
+    return diseases
+
+
 @router.post("/predict")
 async def predict_disease(symptoms: str):
     # Split the symptoms input by commas and clean up any whitespace
-    symptoms = [symptom.strip() for symptom in symptoms.split(",")]
+    symptoms = split_symptoms(symptoms)
     # Check if there are at least three symptoms
     if len(symptoms) < 3:
         return {"error": "Please enter at least three symptoms"}
     # Create a binary input vector for the input symptoms
-    input_data = [0] * len(data_dict["symptom_index"])
-    for symptom in symptoms:
-        if symptom.capitalize() in data_dict["symptom_index"]:
-            index = data_dict["symptom_index"][symptom.capitalize()]
-            input_data[index] = 1
-    # Make predictions using the saved models and take the mode of the predictions
-    rf_prediction = data_dict["predictions_classes"][final_rf_model.predict([
-                                                                            input_data])[0]]
-    nb_prediction = data_dict["predictions_classes"][final_nb_model.predict([
-                                                                            input_data])[0]]
-    svm_prediction = data_dict["predictions_classes"][final_svm_model.predict([
-                                                                              input_data])[0]]
-    final_prediction = mode(
-        [rf_prediction, nb_prediction, svm_prediction])[0][0]
+    X, unknown = symptom_encoder().encode([symptoms])
+    final_prediction = (await diagnose(X))[0]
     # Save prediction in MongoDB
     record = {"symptoms": symptoms, "disease": final_prediction}
-    result = collection.insert_one(record)
+    result = await predictions.insert_one(record)
     record_id = str(result.inserted_id)
+    case_sketches.add(final_prediction)
     # Return the final prediction
-    return {"disease": final_prediction, "record_id": record_id}
+    return {"disease": final_prediction, "record_id": record_id, "unknown_symptoms": unknown[0]}
+
+
+@router.post("/predict/batch")
+async def predict_disease_batch(batch: SymptomBatch):
+    if len(batch.symptoms) > PREDICT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {PREDICT_BATCH_MAX_ITEMS} symptom lists per batch")
+    requests = [split_symptoms(symptoms) for symptoms in batch.symptoms]
+    results = [{"error": "Please enter at least three symptoms"} for _ in requests]
+    valid = [i for i, symptoms in enumerate(requests) if len(symptoms) >= 3]
+    if not valid:
+        return {"results": results}
+
+    X, unknown = symptom_encoder().encode([requests[i] for i in valid])
+    diseases = await diagnose(X)
+
+    # Save all predictions in MongoDB at once
+    records = [{"symptoms": requests[i], "disease": disease} for i, disease in zip(valid, diseases)]
+    result = await predictions.insert_many(records)
+    for record in records:
+        case_sketches.add(record["disease"])
+    for i, disease, missing, record_id in zip(valid, diseases, unknown, result.inserted_ids):
+        results[i] = {"disease": disease, "record_id": str(record_id), "unknown_symptoms": missing}
+    return {"results": results}
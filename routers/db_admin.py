@@ -0,0 +1,25 @@
+# routers/db_admin.py
+
+from fastapi import APIRouter
+
+from database import database_stats, get_database, run_db
+from utils.indexes import INDEXES, explain_query_shapes
+
+router = APIRouter()
+
+
+@router.get("/db/pool")
+async def pool_stats():
+    # Connections open, in use and waited for, per server
+    return database_stats()
+
+
+@router.get("/db/indexes")
+async def index_report():
+    # How the planner runs each query shape the API issues
+    shapes = await run_db(explain_query_shapes, get_database())
+    return {
+        "declared": {name: [model.document["name"] for model in models] for name, models in INDEXES.items()},
+        "collscans": [shape for shape in shapes if shape["collscan"]],
+        "query_shapes": shapes,
+    }
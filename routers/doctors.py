@@ -4,7 +4,7 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer
 from pymongo import MongoClient
 from bson import json_util, ObjectId
-from database import get_database
+from database import AsyncDatabase
 from pydantic import BaseModel
 from typing import Dict
 import json
@@ -19,8 +19,8 @@ SECRET_KEY = "justformedicalpurposeapplication"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Connect to MongoDB
-db = get_database()
+# MongoDB collections, the client is opened in the app lifespan
+db = AsyncDatabase()
 doctors_collection = db["doctors"]
 
 router = APIRouter()
@@ -52,7 +52,7 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 @router.get("/doctors")
 async def get_doctors():
-    doctors = doctors_collection.find()
+    doctors = await doctors_collection.find()
     doctors = json.loads(json_util.dumps(doctors))
     for doctor in doctors:
         doctor["_id"] = str(doctor["_id"]["$oid"])  # Remove curly braces from ObjectId string
@@ -62,7 +62,7 @@ async def get_doctors():
 
 @router.get("/doctors/{doctor_id}")
 async def get_doctor(doctor_id: str):
-    doctor = doctors_collection.find_one({"_id": ObjectId(doctor_id)})
+    doctor = await doctors_collection.find_one({"_id": ObjectId(doctor_id)})
     if doctor is None:
         raise HTTPException(status_code=404, detail="Doctor not found")
     return json.loads(json_util.dumps(doctor))
@@ -82,7 +82,7 @@ async def register_doctor(doctor: Doctor):
         raise HTTPException(status_code=403, detail="Invalid doctor ID")
 
     # Check if the username is already taken
-    existing_doctor = doctors_collection.find_one({"username": doctor.username})
+    existing_doctor = await doctors_collection.find_one({"username": doctor.username})
     if existing_doctor:
         raise HTTPException(status_code=409, detail="Username already taken")
 
@@ -92,7 +92,7 @@ async def register_doctor(doctor: Doctor):
     # Insert the doctor object into MongoDB
     doctor_dict = doctor.dict()
     doctor_dict['password'] = hashed_password
-    result = doctors_collection.insert_one(doctor_dict)
+    result = await doctors_collection.insert_one(doctor_dict)
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -108,7 +108,7 @@ async def login_doctor(doctor_login: DoctorLogin):
     hashed_password = hashlib.sha256(doctor_login.password.encode()).hexdigest()
 
     # Find the doctor in MongoDB by email and hashed password
-    doctor = doctors_collection.find_one({
+    doctor = await doctors_collection.find_one({
         "email": doctor_login.email,
         "password": hashed_password
     })
@@ -138,7 +138,7 @@ async def get_current_doctor(token: str = Depends(oauth2_scheme)):
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    doctor = doctors_collection.find_one({"_id": ObjectId(doctor_id)})
+    doctor = await doctors_collection.find_one({"_id": ObjectId(doctor_id)})
     if doctor is None:
         raise HTTPException(status_code=404, detail="Doctor not found")
 
@@ -153,7 +153,7 @@ async def delete_doctor(doctor_id: str, current_doctor: dict = Depends(get_curre
         if str(current_doctor["_id"]) != doctor_id:
             raise HTTPException(status_code=403, detail="Forbidden: You can only delete your own account")
 
-        result = doctors_collection.delete_one({"_id": ObjectId(doctor_id)})
+        result = await doctors_collection.delete_one({"_id": ObjectId(doctor_id)})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Doctor not found")
 
@@ -5,12 +5,12 @@ import numpy as np
 import pytesseract
 from pdf2image import convert_from_path
 from tempfile import NamedTemporaryFile
-from database import get_database
+from database import AsyncDatabase
 import shutil
 import os
 
-# Connect to MongoDB
-db = get_database()
+# MongoDB collections, the client is opened in the app lifespan
+db = AsyncDatabase()
 reports_collection = db["image_processing"]
 
 router = APIRouter()
@@ -60,7 +60,7 @@ async def create_upload_file(user_id: str,file: UploadFile = File(...)):  # Add
             # add user_id to the report dictionary
             report["user_id"] = user_id
             # Insert the report into MongoDB
-            result = reports_collection.insert_one(report)
+            result = await reports_collection.insert_one(report)
             report["_id"] = str(result.inserted_id)  # convert ObjectId to string
             return report
     except Exception as e:
@@ -1,10 +1,19 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-import pickle
-from database import get_database
-
-# Connect to MongoDB
-db = get_database()
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, create_model
+from database import AsyncDatabase
+from utils.inference import executor, predict
+from typing import Optional
+import asyncio
+import json
+import os
+import uuid
+import numpy as np
+import pandas as pd
+
+# MongoDB collections, the client is opened in the app lifespan
+db = AsyncDatabase()
 reports_collection = db["life_style_disease"]
 
 router = APIRouter()
@@ -55,91 +64,176 @@ class LiverModel(BaseModel):
     Albumin : float
     Albumin_and_Globulin_Ratio: float
 
+# Inputs of each model, in the order the model expects them
+MODEL_FEATURES = {
+    "cancer": ["radius_mean", "area_mean", "perimeter_mean", "concavity_mean", "concave_points_mean"],
+    "diabetes": ["pregnancies", "glucose", "blood_pressure", "bmi", "diabetes_pedigree_function", "age"],
+    "heart": ["cp", "trestbps", "chol", "fbs", "restecg", "thalach", "exang"],
+    "liver": ["Total_Bilirubin", "Direct_Bilirubin", "Alkaline_Phosphotase", "Alamine_Aminotransferase",
+              "Total_Protiens", "Albumin", "Albumin_and_Globulin_Ratio"],
+}
+MODEL_SCHEMAS = {"cancer": CancerModel, "diabetes": DiabetesModel, "heart": HeartModel, "liver": LiverModel}
+PATIENT_FIELDS = ("name", "gender", "age")
+
+# The fields of every model schema, so the panel cannot drift from the single
+# endpoints; only the patient fields are required.
+PanelModel = create_model("PanelModel", **{
+    field: (info.annotation, ...) if field in PATIENT_FIELDS else (Optional[info.annotation], None)
+    for schema in MODEL_SCHEMAS.values() for field, info in schema.model_fields.items()
+})
 
 
+def features(model_name, data) -> list:
+    return [getattr(data, field) for field in MODEL_FEATURES[model_name]]
 
-def load_model(filename):
-    with open(filename, 'rb') as file:
-        model = pickle.load(file, fix_imports=True, encoding='latin1')
-    return model
 
 @router.post('/predict_cancer')
 async def predict_cancer(data: CancerModel):
-    model = load_model("prediction/cancer.pkl")
-    prediction = model.predict([[
-        data.radius_mean,
-        data.area_mean,
-        data.perimeter_mean,
-        data.concavity_mean,
-        data.concave_points_mean
-    ]])
+    prediction = await predict("cancer", features("cancer", data))
 
     # Store the prediction and data in MongoDB
     report = {
-        "prediction": int(prediction[0]),
+        "prediction": int(prediction),
         "data": data.dict()
     }
-    reports_collection.insert_one(report)
+    await reports_collection.insert_one(report)
 
-    return {"prediction": int(prediction[0])}
+    return {"prediction": int(prediction)}
 
 @router.post('/predict_diabetes')
 async def predict_diabetes(data: DiabetesModel):
-    model = load_model("prediction/diabetes.pkl")
-    prediction = model.predict([[
-        data.pregnancies,
-        data.glucose,
-        data.blood_pressure,
-        data.bmi,
-        data.diabetes_pedigree_function,
-        data.age
-    ]])
+    prediction = await predict("diabetes", features("diabetes", data))
     # Store the prediction and data in MongoDB
     report = {
-        "prediction": int(prediction[0]),
+        "prediction": int(prediction),
         "data": data.dict()
     }
-    reports_collection.insert_one(report)
-    return {"prediction": int(prediction[0])}
+    await reports_collection.insert_one(report)
+    return {"prediction": int(prediction)}
 
 @router.post('/predict_heart')
 async def predict_heart_disease(data: HeartModel):
-    model = load_model('prediction/heart.pkl')
-
-    prediction = model.predict([[
-        data.cp,
-        data.trestbps,
-        data.chol,
-        data.fbs,
-        data.restecg,
-        data.thalach,
-        data.exang
-    ]])
+    prediction = await predict("heart", features("heart", data))
     # Store the prediction and data in MongoDB
     report = {
-        "prediction": int(prediction[0]),
+        "prediction": int(prediction),
         "data": data.dict()
     }
-    reports_collection.insert_one(report)
-    return {"prediction" : int(prediction[0])}
+    await reports_collection.insert_one(report)
+    return {"prediction" : int(prediction)}
 
 @router.post('/predict_liver')
 async def predict_liver_disease(data: LiverModel):
-    model = load_model("prediction/liver.pkl")
-    prediction = model.predict([[
-        data.Total_Bilirubin,
-        data.Direct_Bilirubin,
-        data.Alkaline_Phosphotase,
-        data.Alamine_Aminotransferase,
-        data.Total_Protiens,
-        data.Albumin,
-        data.Albumin_and_Globulin_Ratio
-    ]])
+    prediction = await predict("liver", features("liver", data))
     # Store the prediction and data in MongoDB
     report = {
-        "prediction": int(prediction[0]),
+        "prediction": int(prediction),
         "data": data.dict()
     }
-    reports_collection.insert_one(report)
-    return{"prediction": int(prediction[0])}
-
+    await reports_collection.insert_one(report)
+    return{"prediction": int(prediction)}
+
+
+@router.post('/predict_panel')
+async def predict_panel(data: PanelModel):
+    values = data.dict()
+    # Only models whose inputs are all present are evaluated
+    models = [name for name, fields in MODEL_FEATURES.items()
+              if all(values[field] is not None for field in fields)]
+    skipped = [name for name in MODEL_FEATURES if name not in models]
+    if not models:
+        raise HTTPException(status_code=400, detail="Not enough inputs for any model")
+
+    predictions = await asyncio.gather(*[
+        predict(name, features(name, data)) for name in models
+    ])
+    predictions = {name: int(prediction) for name, prediction in zip(models, predictions)}
+
+    # Store one combined report in MongoDB
+    report = {
+        "predictions": predictions,
+        "data": data.dict(exclude_none=True)
+    }
+    await reports_collection.insert_one(report)
+    return {"predictions": predictions, "skipped": skipped}
+
+
+# Columns of each model's training CSV, in the order the model expects them
+SCREENING_COLUMNS = {
+    "cancer": ["radius_mean", "area_mean", "perimeter_mean", "concavity_mean", "concave points_mean"],
+    "diabetes": ["Pregnancies", "Glucose", "BloodPressure", "BMI", "DiabetesPedigreeFunction", "Age"],
+    "heart": ["cp", "trestbps", "chol", "fbs", "restecg", "thalach", "exang"],
+    "liver": ["Total_Bilirubin", "Direct_Bilirubin", "Alkaline_Phosphotase", "Alamine_Aminotransferase",
+              "Total_Protiens", "Albumin", "Albumin_and_Globulin_Ratio"],
+}
+SCREENING_CHUNK_ROWS = int(os.environ.get("SCREENING_CHUNK_ROWS", "1000"))
+
+
+async def screening_results(model_name, reader, screening_id, filename, output_format, store):
+    columns = SCREENING_COLUMNS[model_name]
+    if output_format == "csv":
+        yield "row,prediction\n"
+    row = 0
+    while True:
+        # Parsing is blocking, only one chunk is held in memory at a time
+        chunk = await run_in_threadpool(next, reader, None)
+        if chunk is None:
+            break
+        X = chunk[columns].to_numpy(dtype=np.float64)
+        complete = ~np.isnan(X).any(axis=1)
+        predictions = np.full(len(X), None, dtype=object)
+        if complete.any():
+            try:
+                # One vectorized predict per chunk, kept out of the single-row cache
+                predictions[complete] = [int(p) for p in await executor.predict_batch(model_name, X[complete])]
+            except Exception as e:
+                # The status is already sent, so the failure goes in the body;
+                # rows before this one were returned and stored
+                detail = getattr(e, "detail", None) or str(e) or type(e).__name__
+                print(f"Screening {screening_id} stopped at row {row}: {detail}")
+                if output_format == "csv":
+                    yield f"{row},error: {detail}\n"
+                else:
+                    yield json.dumps({"row": row, "error": detail}) + "\n"
+                return
+
+        if store and complete.any():
+            reports = [
+                {"prediction": predictions[i], "data": dict(zip(columns, X[i].tolist())),
+                 "screening_id": screening_id, "source": filename}
+                for i in np.flatnonzero(complete)
+            ]
+            await reports_collection.insert_many(reports, ordered=False)
+
+        lines = []
+        for prediction in predictions:
+            if output_format == "csv":
+                lines.append(f"{row},{'' if prediction is None else prediction}\n")
+            else:
+                lines.append(json.dumps({"row": row, "prediction": prediction}) + "\n")
+            row += 1
+        yield "".join(lines)
+
+
+@router.post('/screen/{model_name}')
+async def screen_csv(model_name: str, file: UploadFile = File(...), format: str = "ndjson", store: bool = True):
+    if model_name not in SCREENING_COLUMNS:
+        raise HTTPException(status_code=404, detail="Model not found")
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Format must be ndjson or csv")
+
+    columns = SCREENING_COLUMNS[model_name]
+    header = pd.read_csv(file.file, nrows=0).columns
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing columns: {', '.join(missing)}")
+    file.file.seek(0)
+
+    screening_id = str(uuid.uuid4())
+    reader = pd.read_csv(file.file, usecols=columns, chunksize=SCREENING_CHUNK_ROWS)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        screening_results(model_name, reader, screening_id, file.filename, format, store),
+        media_type=media_type,
+        headers={"X-Screening-Id": screening_id},
+    )
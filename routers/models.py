@@ -0,0 +1,38 @@
+# routers/models.py
+
+import os
+
+from fastapi import APIRouter, Header, HTTPException
+from typing import Optional
+from utils.inference import prediction_cache
+from utils.model_registry import registry
+
+router = APIRouter()
+
+MODEL_ADMIN_TOKEN = os.environ.get("MODEL_ADMIN_TOKEN")
+
+
+@router.get("/models")
+async def list_models():
+    return registry.metadata()
+
+
+@router.get("/models/cache")
+async def prediction_cache_stats():
+    return prediction_cache.stats()
+
+
+@router.post("/models/{name}/reload")
+async def reload_model(name: str, x_admin_token: Optional[str] = Header(None)):
+    # Reloading is disabled unless an admin token is configured
+    if not MODEL_ADMIN_TOKEN or x_admin_token != MODEL_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if name not in registry.specs:
+        raise HTTPException(status_code=404, detail="Model not found")
+
+    try:
+        entry = await registry.reload(name)
+    except Exception as e:
+        # The previous model stays in service
+        raise HTTPException(status_code=422, detail=f"Model rejected: {e}")
+    return entry.metadata()
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pymongo import MongoClient
 from bson import json_util, ObjectId
-from database import get_database
+from database import AsyncDatabase
 from pydantic import BaseModel
 import json
 from bson.json_util import dumps
@@ -9,8 +9,8 @@ from datetime import datetime
 
 router = APIRouter()
 
-# Connect to MongoDB
-db = get_database()
+# MongoDB collections, the client is opened in the app lifespan
+db = AsyncDatabase()
 appointments_collection = db["appointments"]
 
 class Notification(BaseModel):
@@ -21,7 +21,7 @@ class Notification(BaseModel):
 
 @router.get("/notifications")
 async def list_notifications():
-    notifications = appointments_collection.find({"status": "accepted"})
+    notifications = await appointments_collection.find({"status": "accepted"})
     notifications = json.loads(dumps(notifications))  # Convert BSON to JSON
     for notification in notifications:
         notification["_id"] = str(notification["_id"]["$oid"])
@@ -34,7 +34,7 @@ async def list_notifications():
 
 @router.get("/notifications/user/{user_id}")
 async def list_notifications_by_user(user_id: str):
-    notifications = appointments_collection.find({
+    notifications = await appointments_collection.find({
         "user_id": ObjectId(user_id),
         "status": "accepted"
     })
@@ -50,7 +50,7 @@ async def list_notifications_by_user(user_id: str):
 
 @router.get("/notifications/user/{user_id}/count")
 async def count_notifications_by_user(user_id: str):
-    count = appointments_collection.count_documents({
+    count = await appointments_collection.count_documents({
         "user_id": ObjectId(user_id),
         "status": {"$in": ["accepted", "rejected"]}
     })
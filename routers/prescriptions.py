@@ -5,14 +5,14 @@ from fastapi import APIRouter, HTTPException, Response
 from fastapi.responses import FileResponse
 from pymongo import MongoClient
 from bson import json_util, ObjectId
-from database import get_database
+from database import AsyncDatabase
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
 import json
 
-# Connect to MongoDB
-db = get_database()
+# MongoDB collections, the client is opened in the app lifespan
+db = AsyncDatabase()
 prescriptions_collection = db["prescriptions"]
 
 router = APIRouter()
@@ -56,7 +56,7 @@ class PrescriptionPDF(FPDF):
 
 @router.get("/download_prescription/{prescription_id}")
 async def download_prescription(prescription_id: str):
-    prescription = prescriptions_collection.find_one({"_id": ObjectId(prescription_id)})
+    prescription = await prescriptions_collection.find_one({"_id": ObjectId(prescription_id)})
 
     if prescription is None:
         raise HTTPException(status_code=404, detail="Prescription not found")
@@ -84,13 +84,13 @@ async def add_prescription(prescription: Prescription):
     if "status" not in prescription_dict:
         prescription_dict["status"] = False
 
-    result = prescriptions_collection.insert_one(prescription_dict)
+    result = await prescriptions_collection.insert_one(prescription_dict)
 
     return {"message": "Prescription added successfully", "id": str(result.inserted_id)}
 
 @router.get("/prescriptions/{doctor_id}")
 async def get_prescriptions(doctor_id: str):
-    prescriptions = prescriptions_collection.find({"doctor_id": doctor_id})
+    prescriptions = await prescriptions_collection.find({"doctor_id": doctor_id})
 
     if prescriptions is None:
         raise HTTPException(status_code=404, detail="No prescriptions found")
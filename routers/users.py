@@ -6,7 +6,7 @@ from fastapi.security import OAuth2PasswordBearer
 from pymongo import MongoClient
 from bson import json_util, ObjectId
 from typing import Optional
-from database import get_database
+from database import AsyncDatabase
 from pydantic import BaseModel
 import json
 import hashlib
@@ -18,8 +18,8 @@ SECRET_KEY = "justformedicalpurposeapplication"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Connect to MongoDB
-db = get_database()
+# MongoDB collections, the client is opened in the app lifespan
+db = AsyncDatabase()
 users_collection = db["users"]
 
 router = APIRouter()
@@ -50,12 +50,12 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 @router.get("/users")
 async def get_users():
-    users = users_collection.find()
+    users = await users_collection.find()
     return json.loads(json_util.dumps(users))  # Convert BSON to JSON
 
 @router.get("/users/{user_id}")
 async def get_user(user_id: str):
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await users_collection.find_one({"_id": ObjectId(user_id)})
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return json.loads(json_util.dumps(user))
@@ -63,7 +63,7 @@ async def get_user(user_id: str):
 @router.post("/register/user")
 async def register_user(user: User):
     # Check if the username is already taken
-    existing_user = users_collection.find_one({"username": user.username})
+    existing_user = await users_collection.find_one({"username": user.username})
     if existing_user:
         return {"error": "Username already taken"}
 
@@ -73,7 +73,7 @@ async def register_user(user: User):
     # Insert the user object into MongoDB
     user_dict = user.dict()
     user_dict['password'] = hashed_password
-    result = users_collection.insert_one(user_dict)
+    result = await users_collection.insert_one(user_dict)
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -81,7 +81,7 @@ async def register_user(user: User):
     )
 
     # Retrieve the user object from MongoDB
-    user_data = users_collection.find_one({"_id": result.inserted_id})
+    user_data = await users_collection.find_one({"_id": result.inserted_id})
 
     # Create a dictionary of user details to return
     user_details = {
@@ -104,7 +104,7 @@ async def login_user(user_login: UserLogin):
     hashed_password = hashlib.sha256(user_login.password.encode()).hexdigest()
 
     # Find the user in MongoDB by email and hashed password
-    user = users_collection.find_one({
+    user = await users_collection.find_one({
         "email": user_login.email,
         "password": hashed_password
     })
@@ -133,7 +133,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await users_collection.find_one({"_id": ObjectId(user_id)})
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -155,7 +155,7 @@ async def delete_user(
     if user_id != current_user["_id"]:
         raise HTTPException(status_code=403, detail="Forbidden: You can only delete your own account")
 
-    result = users_collection.delete_one({"_id": ObjectId(user_id)})
+    result = await users_collection.delete_one({"_id": ObjectId(user_id)})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     
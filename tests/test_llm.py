@@ -0,0 +1,152 @@
+# tests/test_llm.py
+#
+# LLMClient against a stub provider served by httpx.MockTransport.
+#
+#   python -m pytest tests
+
+import asyncio
+import time
+
+import httpx
+import numpy as np
+import pytest
+
+from routers import chatbot
+from utils.cache import TTLCache
+from utils.llm import CircuitBreaker, LLMClient, LLMUnavailable
+
+RESET_SECONDS = 0.05
+
+
+class StubProvider:
+    """Answers /completions like the provider, with a scripted status and delay."""
+
+    def __init__(self, status=200, delay=0.0, text="Influenza"):
+        self.status = status
+        self.delay = delay
+        self.text = text
+        self.calls = 0
+
+    async def __call__(self, request):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return httpx.Response(self.status, json={"error": "unavailable"})
+        return httpx.Response(200, json={"choices": [{"text": f" {self.text}\n"}]})
+
+
+def stub_client(provider, timeout=1.0, max_failures=3):
+    # Built inside the running loop, the semaphore binds to it on Python 3.9
+    client = LLMClient(base_url="http://llm.test", api_key="test", timeout=timeout, max_concurrency=4)
+    client.breaker = CircuitBreaker(max_failures, RESET_SECONDS)
+    client.client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(provider))
+    client.limit = asyncio.Semaphore(client.max_concurrency)
+    return client
+
+
+async def trip(client, provider):
+    # Fail until the breaker opens
+    provider.status = 500
+    for _ in range(client.breaker.max_failures):
+        with pytest.raises(LLMUnavailable):
+            await client.complete("prompt")
+    assert client.breaker.state == "open"
+
+
+class StubEncoder:
+    def encode(self, rows):
+        return np.ones((len(rows), 3), dtype=np.uint8), []
+
+
+def test_slow_provider_falls_back_to_local_models(monkeypatch):
+    async def diagnose(X):
+        return ["Common Cold"] * len(X)
+
+    async def scenario():
+        provider = StubProvider(delay=5.0)
+        client = stub_client(provider, timeout=0.2)
+        monkeypatch.setattr(chatbot, "llm_client", client)
+        monkeypatch.setattr(chatbot, "llm_cache", TTLCache(10, 60))
+        monkeypatch.setattr(chatbot, "symptom_encoder", StubEncoder)
+        monkeypatch.setattr(chatbot, "diagnose", diagnose)
+
+        start = time.perf_counter()
+        prediction, source = await chatbot.generate_prediction(["cough", "fever", "headache"])
+        elapsed = time.perf_counter() - start
+        await client.close()
+        return provider, client, prediction, source, elapsed
+
+    provider, client, prediction, source, elapsed = asyncio.run(scenario())
+    assert (prediction, source) == ("Common Cold", "local")
+    assert provider.calls == 1
+    # The deadline cut the call short, it did not wait for the provider
+    assert elapsed < 1.0
+    assert client.breaker.failures == 1
+
+
+def test_breaker_opens_after_max_failures():
+    async def scenario():
+        provider = StubProvider()
+        client = stub_client(provider, max_failures=3)
+        await trip(client, provider)
+        assert provider.calls == 3
+
+        # Open: fails fast without reaching the provider
+        with pytest.raises(LLMUnavailable, match="circuit open"):
+            await client.complete("prompt")
+        assert provider.calls == 3
+        await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_half_open_lets_one_trial_through():
+    async def scenario():
+        provider = StubProvider()
+        client = stub_client(provider)
+        await trip(client, provider)
+        calls = provider.calls
+
+        await asyncio.sleep(RESET_SECONDS)
+        assert client.breaker.state == "half-open"
+        provider.delay = 0.1
+        trial = asyncio.ensure_future(client.complete("trial"))
+        await asyncio.sleep(0.01)
+        # Only the trial reaches the provider while it is in flight
+        with pytest.raises(LLMUnavailable, match="circuit open"):
+            await client.complete("prompt")
+        with pytest.raises(LLMUnavailable):
+            await trial
+        assert provider.calls == calls + 1
+
+        # The failed trial opens the breaker for another reset period
+        assert client.breaker.state == "open"
+        with pytest.raises(LLMUnavailable, match="circuit open"):
+            await client.complete("prompt")
+        assert provider.calls == calls + 1
+        await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_breaker_recovers_after_successful_trial():
+    async def scenario():
+        provider = StubProvider(text="Migraine")
+        client = stub_client(provider)
+        await trip(client, provider)
+
+        await asyncio.sleep(RESET_SECONDS)
+        provider.status = 200
+        assert await client.complete("trial") == "Migraine"
+        assert client.breaker.state == "closed"
+        assert client.breaker.failures == 0
+
+        # Closed again: calls go through, and one failure does not reopen it
+        assert await client.complete("prompt") == "Migraine"
+        provider.status = 500
+        with pytest.raises(LLMUnavailable):
+            await client.complete("prompt")
+        assert client.breaker.state == "closed"
+        await client.close()
+
+    asyncio.run(scenario())
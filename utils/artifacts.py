@@ -0,0 +1,240 @@
+# utils/artifacts.py
+#
+# Memory-mappable model artifacts.
+#
+# An artifact is a directory holding a manifest.json and one .npy file per
+# numeric array. Loading opens the arrays with mmap_mode='r', so every worker
+# process maps the same page-cache copy instead of unpickling its own, and
+# startup does no deserialization work proportional to model size.
+#
+#   python -m utils.artifacts                 # convert every registry model
+#   python -m utils.artifacts heart symptom   # convert some of them
+#   python -m utils.artifacts --cleanup       # remove unreferenced old versions
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from utils.forest import CompiledForest, compile_forest
+
+FORMAT_VERSION = 1
+ARTIFACT_DIR = "prediction/artifacts"
+
+
+class ArrayGaussianNB:
+    """GaussianNB prediction from plain arrays, computed exactly like sklearn."""
+
+    def __init__(self, theta, var, class_prior, classes):
+        self.theta_ = theta
+        self.var_ = var
+        self.class_prior_ = class_prior
+        self.classes_ = classes
+        self.n_features_in_ = theta.shape[1]
+
+    @classmethod
+    def from_sklearn(cls, model):
+        return cls(model.theta_, model.var_, model.class_prior_, model.classes_)
+
+    def _joint_log_likelihood(self, X):
+        joint_log_likelihood = []
+        for i in range(np.size(self.classes_)):
+            jointi = np.log(self.class_prior_[i])
+            n_ij = -0.5 * np.sum(np.log(2.0 * np.pi * self.var_[i, :]))
+            n_ij -= 0.5 * np.sum(((X - self.theta_[i, :]) ** 2) / (self.var_[i, :]), 1)
+            joint_log_likelihood.append(jointi + n_ij)
+        return np.array(joint_log_likelihood).T
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return self.classes_[np.argmax(self._joint_log_likelihood(X), axis=1)]
+
+
+def _save_arrays(directory, prefix, arrays):
+    files = {}
+    for key, array in arrays.items():
+        filename = f"{prefix}.{key}.npy"
+        array = np.ascontiguousarray(array)
+        if array.dtype == object:
+            # String class labels, stored without pickle
+            array = array.astype(str)
+        np.save(os.path.join(directory, filename), array)
+        files[key] = filename
+    return files
+
+
+def _export_estimator(directory, prefix, model):
+    model = compile_forest(model)
+    if isinstance(model, CompiledForest):
+        return {
+            "kind": "forest",
+            "depth": int(model.depth),
+            "n_features": int(model.n_features_in_),
+            "value_scale": float(model.value_scale),
+            "arrays": _save_arrays(directory, prefix, {
+                "feature": model.feature, "threshold": model.threshold,
+                "left": model.left, "right": model.right, "value": model.value,
+                "roots": model.roots, "classes": model.classes_,
+            }),
+        }
+    if type(model).__name__ == "GaussianNB":
+        model = ArrayGaussianNB.from_sklearn(model)
+        return {
+            "kind": "gaussian_nb",
+            "arrays": _save_arrays(directory, prefix, {
+                "theta": model.theta_, "var": model.var_,
+                "class_prior": model.class_prior_, "classes": model.classes_,
+            }),
+        }
+    # Anything else (the SVC) keeps its pickle, joblib still memory-maps the
+    # numpy arrays inside it
+    filename = f"{prefix}.joblib"
+    joblib.dump(model, os.path.join(directory, filename))
+    return {"kind": "joblib", "file": filename}
+
+
+def _load_estimator(directory, component, mmap_mode):
+    if component["kind"] == "joblib":
+        return joblib.load(os.path.join(directory, component["file"]), mmap_mode=mmap_mode)
+
+    arrays = {
+        key: np.load(os.path.join(directory, filename), mmap_mode=mmap_mode, allow_pickle=False)
+        for key, filename in component["arrays"].items()
+    }
+    if component["kind"] == "forest":
+        return CompiledForest(depth=component["depth"], n_features=component["n_features"],
+                              value_scale=component.get("value_scale", 1.0), **arrays)
+    if component["kind"] == "gaussian_nb":
+        return ArrayGaussianNB(**arrays)
+    raise ValueError(f"Unknown artifact component {component['kind']}")
+
+
+def export_artifact(model, directory: str, source: str = None, source_version: str = None) -> str:
+    """Write model (a forest or the symptom ensemble tuple) as an artifact.
+
+    Arrays are written into a new temporary directory, which is renamed to
+    a name no other export uses, and the manifest is swapped in last. A
+    process loading the artifact concurrently sees either the old version
+    or the new one, and the old data stays on disk until cleanup_artifacts().
+    """
+    version = source_version or "unversioned"
+    os.makedirs(directory, exist_ok=True)
+    data_dir = tempfile.mkdtemp(prefix=".tmp-", dir=directory)
+
+    manifest = {"format": FORMAT_VERSION, "source": source, "source_version": source_version}
+    if isinstance(model, tuple):
+        final_rf_model, final_nb_model, final_svm_model, data_dict = model
+        manifest["kind"] = "ensemble"
+        manifest["components"] = [
+            _export_estimator(data_dir, name, estimator)
+            for name, estimator in (("rf", final_rf_model), ("nb", final_nb_model), ("svm", final_svm_model))
+        ]
+        manifest["data_dict"] = {
+            "symptom_index": {symptom: int(index) for symptom, index in data_dict["symptom_index"].items()},
+            "predictions_classes": [str(c) for c in data_dict["predictions_classes"]],
+        }
+    else:
+        manifest["kind"] = "estimator"
+        manifest["components"] = [_export_estimator(data_dir, "model", model)]
+    # mkdtemp's random suffix keeps the name unique across re-exports
+    published = os.path.join(directory, f"{version}-{os.path.basename(data_dir)[len('.tmp-'):]}")
+    os.chmod(data_dir, 0o755)
+    os.rename(data_dir, published)
+    manifest["data_dir"] = os.path.basename(published)
+
+    manifest_path = os.path.join(directory, "manifest.json")
+    with open(manifest_path + ".tmp", "w") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return manifest_path
+
+
+def read_manifest(manifest_path: str) -> dict:
+    with open(manifest_path) as file:
+        return json.load(file)
+
+
+def cleanup_artifacts(directory: str, min_age_seconds: float = 3600) -> list:
+    """Remove data directories the manifest no longer references.
+
+    Only ones untouched for min_age_seconds, so a process that read the
+    previous manifest just before the swap can still open its files.
+    """
+    manifest_path = os.path.join(directory, "manifest.json")
+    current = read_manifest(manifest_path)["data_dir"] if os.path.exists(manifest_path) else None
+    removed = []
+    for entry in os.listdir(directory):
+        path = os.path.join(directory, entry)
+        if entry == current or not os.path.isdir(path):
+            continue
+        if time.time() - os.stat(path).st_mtime >= min_age_seconds:
+            shutil.rmtree(path)
+            removed.append(path)
+    return removed
+
+
+def load_artifact(manifest_path: str, mmap_mode: str = 'r'):
+    manifest = read_manifest(manifest_path)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format')}")
+
+    data_dir = os.path.join(os.path.dirname(manifest_path), manifest["data_dir"])
+    estimators = [_load_estimator(data_dir, component, mmap_mode) for component in manifest["components"]]
+    if manifest["kind"] == "ensemble":
+        data_dict = {
+            "symptom_index": manifest["data_dict"]["symptom_index"],
+            "predictions_classes": np.asarray(manifest["data_dict"]["predictions_classes"]),
+        }
+        return tuple(estimators) + (data_dict,)
+    return estimators[0]
+
+
+def artifact_path(name: str) -> str:
+    return os.path.join(ARTIFACT_DIR, name, "manifest.json")
+
+
+def main(argv=None):
+    from utils.model_registry import MODEL_SPECS, file_version
+
+    parser = argparse.ArgumentParser(description="Convert the served models to memory-mapped artifacts")
+    parser.add_argument("models", nargs="*", help=f"models to convert (default: all of {', '.join(MODEL_SPECS)})")
+    parser.add_argument("--cleanup", action="store_true", help="remove old versions instead of converting")
+    parser.add_argument("--min-age-hours", type=float, default=1.0, help="keep old versions younger than this")
+    args = parser.parse_args(argv)
+
+    if args.cleanup:
+        for name in args.models or MODEL_SPECS:
+            directory = os.path.dirname(artifact_path(name))
+            if os.path.isdir(directory):
+                for path in cleanup_artifacts(directory, args.min_age_hours * 3600):
+                    print(f"Removed {path}")
+        return 0
+
+    failed = []
+    for name in args.models or MODEL_SPECS:
+        spec = MODEL_SPECS[name]
+        if not os.path.exists(spec.path):
+            print(f"Skipping {name}: {spec.path} not found")
+            continue
+        try:
+            model = spec.loader(spec.path)
+            manifest_path = export_artifact(model, os.path.dirname(artifact_path(name)),
+                                            source=spec.path, source_version=file_version(spec.path))
+        except Exception as e:
+            # Like load_all: the app serves this model from its pickle instead
+            print(f"Could not convert {name}: {e}")
+            failed.append(name)
+            continue
+        print(f"Converted {spec.path} -> {manifest_path}")
+    # Only fail when the models were asked for by name, so image builds go on
+    return 1 if failed and args.models else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
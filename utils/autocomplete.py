@@ -0,0 +1,108 @@
+# utils/autocomplete.py
+
+from functools import lru_cache
+from typing import Dict, List
+
+from utils.model_registry import registry
+from utils.symptoms import normalize_symptom
+
+TRIE_END = "$"
+
+
+def trigrams(text: str):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymptomAutocomplete:
+    """Prefix trie plus trigram index over the model's symptom names.
+
+    Every word of a name is inserted, so "rash" finds "Skin Rash". Each trie
+    node keeps the ranked matches below it, so a lookup is a walk of
+    len(query) steps. When prefixes give too few results the trigram index
+    adds close spellings ("vomitting" -> "Vomiting").
+    """
+
+    def __init__(self, symptom_index: Dict[str, int], min_similarity: float = 0.3):
+        self.symptom_index = symptom_index
+        self.names = sorted(symptom_index)
+        self.normalized = [normalize_symptom(name) for name in self.names]
+        self.min_similarity = min_similarity
+
+        self.trie = {}
+        for i, name in enumerate(self.normalized):
+            words = name.split(" ")
+            for start in range(len(words)):
+                # Whole-name prefixes rank before matches on a later word
+                rank = (0 if start == 0 else 1, i)
+                node = self.trie
+                for char in " ".join(words[start:]):
+                    node = node.setdefault(char, {})
+                    node.setdefault(TRIE_END, set()).add(rank)
+        self._freeze(self.trie)
+
+        self.trigram_index = {}
+        self.name_trigrams = [trigrams(name) for name in self.normalized]
+        for i, grams in enumerate(self.name_trigrams):
+            for gram in grams:
+                self.trigram_index.setdefault(gram, []).append(i)
+
+        self.complete = lru_cache(maxsize=4096)(self._complete)
+
+    def _freeze(self, node):
+        for key, child in node.items():
+            if key == TRIE_END:
+                seen, ranked = set(), []
+                for _, i in sorted(child):
+                    if i not in seen:
+                        seen.add(i)
+                        ranked.append(i)
+                node[TRIE_END] = tuple(ranked)
+            else:
+                self._freeze(child)
+
+    def prefix(self, query: str) -> tuple:
+        node = self.trie
+        for char in query:
+            node = node.get(char)
+            if node is None:
+                return ()
+        return node.get(TRIE_END, ())
+
+    def fuzzy(self, query: str) -> List[int]:
+        grams = trigrams(query)
+        shared = {}
+        for gram in grams:
+            for i in self.trigram_index.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        scored = []
+        for i, count in shared.items():
+            similarity = count / len(grams | self.name_trigrams[i])
+            if similarity >= self.min_similarity:
+                scored.append((-similarity, i))
+        return [i for _, i in sorted(scored)]
+
+    def _complete(self, query: str, limit: int) -> tuple:
+        query = normalize_symptom(query)
+        if not query:
+            return ()
+        matches = list(self.prefix(query)[:limit])
+        if len(matches) < limit:
+            for i in self.fuzzy(query):
+                if i not in matches:
+                    matches.append(i)
+                if len(matches) == limit:
+                    break
+        return tuple(self.names[i] for i in matches)
+
+
+_autocomplete = None
+
+
+def symptom_autocomplete() -> SymptomAutocomplete:
+    # Rebuilt whenever a reload brings a different symptom index
+    global _autocomplete
+    symptom_index = registry.get("symptom")[3]["symptom_index"]
+    if _autocomplete is None or _autocomplete.symptom_index is not symptom_index:
+        _autocomplete = SymptomAutocomplete(symptom_index)
+    return _autocomplete
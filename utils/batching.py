@@ -0,0 +1,59 @@
+# utils/batching.py
+
+import asyncio
+from typing import Awaitable, Callable, List, Sequence
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Collects rows submitted concurrently and predicts them in one call.
+
+    A batch is flushed when it reaches max_rows or when the first row in it
+    has waited max_wait seconds, whichever comes first.
+    """
+
+    def __init__(self, predict_batch: Callable[[np.ndarray], Awaitable[Sequence]], max_rows: int, max_wait: float):
+        self.predict_batch = predict_batch
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self._rows: List[Sequence] = []
+        self._futures: List[asyncio.Future] = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, row: Sequence):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._rows.append(row)
+        self._futures.append(future)
+        if len(self._rows) >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        rows, futures = self._rows, self._futures
+        self._rows, self._futures = [], []
+        if rows:
+            task = asyncio.ensure_future(self._run(rows, futures))
+            # Keep a reference until the batch is done
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, rows, futures):
+        try:
+            results = await self.predict_batch(np.asarray(rows))
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            # The caller may have gone away (client disconnect)
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,135 @@
+# utils/counters.py
+
+import math
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from utils.outbreak import coordinates
+
+BACKFILL_MARKER = "backfill"
+
+
+def region_cell(location, degrees: float) -> Optional[str]:
+    """Coarse grid cell of a location, e.g. "12:77" for 1 degree cells."""
+    point = coordinates(location) if location is not None else None
+    if point is None:
+        return None
+    return f"{math.floor(point[0] / degrees)}:{math.floor(point[1] / degrees)}"
+
+
+class DiseaseCounters:
+    """Prediction counts per disease, kept up to date with $inc.
+
+    Every recorded prediction increments one document per bucket: the
+    all-time total, its day, its region and its day and region together.
+    Reading a bucket is then a lookup of one document per disease instead
+    of a $group over the whole predictions collection.
+    """
+
+    def __init__(self, collection, region_degrees: float = 1.0):
+        self.collection = collection
+        self.region_degrees = region_degrees
+
+    def bucket_keys(self, disease: str, location, created_at: Optional[datetime]):
+        region = region_cell(location, self.region_degrees)
+        day = created_at.strftime("%Y-%m-%d") if created_at else None
+        yield {"bucket": "total"}
+        if day:
+            yield {"bucket": "day", "day": day}
+        if region:
+            yield {"bucket": "region", "region": region}
+        if day and region:
+            yield {"bucket": "day_region", "day": day, "region": region}
+
+    def updates(self, counts: Iterable[Tuple[dict, str, int]]) -> List[UpdateOne]:
+        updates = []
+        for bucket, disease, count in counts:
+            fields = dict(bucket, disease=disease)
+            key = "|".join(str(fields.get(name, "")) for name in ("bucket", "day", "region", "disease"))
+            updates.append(UpdateOne({"_id": key}, {"$inc": {"count": count}, "$setOnInsert": fields}, upsert=True))
+        return updates
+
+    def record(self, disease: str, location=None, created_at: Optional[datetime] = None):
+        # One round trip for all of the prediction's buckets
+        buckets = self.bucket_keys(disease, location, created_at)
+        self.collection.bulk_write(self.updates((bucket, disease, 1) for bucket in buckets), ordered=False)
+
+    def counts(self, day: Optional[str] = None, region: Optional[str] = None) -> Dict[str, int]:
+        query = {"bucket": "total"}
+        if day and region:
+            query = {"bucket": "day_region", "day": day, "region": region}
+        elif day:
+            query = {"bucket": "day", "day": day}
+        elif region:
+            query = {"bucket": "region", "region": region}
+        return {counter["disease"]: counter["count"]
+                for counter in self.collection.find(query, {"disease": 1, "count": 1})}
+
+    def start_backfill(self, started: datetime) -> bool:
+        """Register a process that counts from started on; False once the backfill is complete.
+
+        The cutoff is the earliest start of any process, so every prediction
+        stored before it predates record() and every one after it was
+        counted live. This relies on the instances' clocks agreeing.
+        """
+        try:
+            self.collection.update_one(
+                {"_id": BACKFILL_MARKER, "completed": False},
+                {"$min": {"cutoff": started}, "$setOnInsert": {"cursor": None}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            # The marker exists but is no longer incomplete
+            return False
+
+    def backfill_batch(self, predictions, owner: str, batch_size: int = 1000,
+                       lease_seconds: float = 300.0) -> Optional[int]:
+        """Count the next batch of predictions stored before the cutoff.
+
+        Returns how many predictions were read, 0 once the backfill is
+        complete, or None while another process holds it. Progress is kept
+        on the marker, so a crashed backfill resumes where it stopped once
+        its lease runs out.
+        """
+        now = datetime.utcnow()
+        marker = self.collection.find_one_and_update(
+            {"_id": BACKFILL_MARKER, "completed": False,
+             "$or": [{"owner": owner}, {"lease_until": {"$lt": now}}, {"lease_until": {"$exists": False}}]},
+            {"$set": {"owner": owner, "lease_until": now + timedelta(seconds=lease_seconds)}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if marker is None:
+            pending = self.collection.find_one({"_id": BACKFILL_MARKER, "completed": False}, {"_id": 1})
+            return None if pending else 0
+
+        # Predictions stored before created_at was recorded are older than any cutoff
+        query = {"$or": [{"created_at": {"$lt": marker["cutoff"]}}, {"created_at": {"$exists": False}}]}
+        if marker["cursor"] is not None:
+            query = {"$and": [query, {"_id": {"$gt": marker["cursor"]}}]}
+        records = list(predictions.find(query, {"prediction": 1, "location": 1, "created_at": 1})
+                       .sort("_id", 1).limit(batch_size))
+        if not records:
+            self.collection.update_one(
+                {"_id": BACKFILL_MARKER, "owner": owner},
+                {"$set": {"completed": True, "completed_at": now}, "$unset": {"lease_until": ""}},
+            )
+            return 0
+
+        counts = Counter()
+        for record in records:
+            if record.get("prediction") is None:
+                continue
+            for bucket in self.bucket_keys(record["prediction"], record.get("location"), record.get("created_at")):
+                counts[(tuple(bucket.items()), record["prediction"])] += 1
+        updates = self.updates((dict(bucket), disease, count) for (bucket, disease), count in counts.items())
+        # The cursor moves in the same ordered write, after the counts; a
+        # crash in between recounts at most this batch
+        updates.append(UpdateOne({"_id": BACKFILL_MARKER, "owner": owner},
+                                 {"$set": {"cursor": records[-1]["_id"]}}))
+        self.collection.bulk_write(updates, ordered=True)
+        return len(records)
@@ -0,0 +1,106 @@
+# utils/db_benchmark.py
+#
+# Concurrent request throughput of the MongoDB access paths.
+#
+#   python -m utils.db_benchmark --concurrency 64 --requests 5000
+#
+# Each simulated request is what a typical router handler does: a find_one
+# by _id followed by an insert_one. "blocking" issues the pymongo calls
+# straight from the coroutine, as the routers did before, so every request
+# waits for the round trips of all the others. "offload" awaits the same
+# calls through AsyncCollection, which runs them on the bounded database
+# threads. Besides requests per second, the largest delay of a 10ms timer
+# on the event loop shows how long other requests would have been stalled.
+# Documents go to a scratch collection that is dropped at the end.
+
+import argparse
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+import database
+from database import MONGO_THREADS, AsyncCollection, get_database
+
+TICK_SECONDS = 0.01
+
+
+async def loop_lag(stop: asyncio.Event, delays: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        delays.append(time.perf_counter() - start - TICK_SECONDS)
+
+
+async def blocking_request(collection, document_id):
+    collection.find_one({"_id": document_id})
+    collection.insert_one({"ref": document_id, "created_at": time.time()})
+
+
+async def offload_request(collection, document_id):
+    await collection.find_one({"_id": document_id})
+    await collection.insert_one({"ref": document_id, "created_at": time.time()})
+
+
+async def run_mode(mode, collection, ids, concurrency, requests):
+    request = blocking_request if mode == "blocking" else offload_request
+    target = collection if mode == "blocking" else AsyncCollection(collection)
+    latencies = []
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while issued < requests:
+            issued += 1
+            start = time.perf_counter()
+            await request(target, ids[issued % len(ids)])
+            latencies.append(time.perf_counter() - start)
+
+    stop = asyncio.Event()
+    delays = []
+    ticker = asyncio.ensure_future(loop_lag(stop, delays))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+
+    return {
+        "requests_per_second": requests / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "max_loop_lag_ms": max(delays, default=0.0) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare blocking and offloaded MongoDB calls under concurrency")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at once")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per mode")
+    parser.add_argument("--documents", type=int, default=1000, help="documents seeded for the reads")
+    parser.add_argument("--collection", default="db_benchmark", help="scratch collection, dropped afterwards")
+    args = parser.parse_args(argv)
+
+    database.connect()
+    collection = get_database()[args.collection]
+    collection.drop()
+    ids = collection.insert_many([{"n": n, "payload": "x" * 200} for n in range(args.documents)]).inserted_ids
+    try:
+        report = {mode: asyncio.run(run_mode(mode, collection, ids, args.concurrency, args.requests))
+                  for mode in ("blocking", "offload")}
+    finally:
+        collection.drop()
+        database.close()
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, {MONGO_THREADS} database threads")
+    for mode, result in report.items():
+        print(f"{mode:9} {result['requests_per_second']:8.0f} req/s  p50 {result['p50_ms']:.2f}ms  "
+              f"p99 {result['p99_ms']:.2f}ms  max loop lag {result['max_loop_lag_ms']:.1f}ms")
+    speedup = report["offload"]["requests_per_second"] / report["blocking"]["requests_per_second"]
+    print(f"offload throughput x{speedup:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
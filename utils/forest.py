@@ -0,0 +1,160 @@
+# utils/forest.py
+
+import numpy as np
+
+
+class CompiledForest:
+    """A fitted RandomForestClassifier flattened into contiguous arrays.
+
+    All trees share one node table (feature, threshold, left, right, value).
+    Leaves point to themselves, so every row of X walks every tree in lockstep
+    for at most max_depth steps. Predictions are the same as sklearn's: X is
+    rounded to float32 before the threshold comparisons and the per-tree
+    probabilities are summed in tree order before averaging.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, depth, n_features, value_scale=1.0):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.depth = depth
+        self.n_features_in_ = n_features
+        # Quantized values are stored as integers times value_scale
+        self.value_scale = value_scale
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        depth = 0
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            nodes = np.arange(offset, offset + n_nodes)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, nodes, tree.children_left + offset))
+            rights.append(np.where(is_leaf, nodes, tree.children_right + offset))
+
+            # Normalize like DecisionTreeClassifier.predict_proba does
+            value = tree.value[:, 0, :forest.n_classes_].astype(np.float64)
+            normalizer = value.sum(axis=1)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer[:, None])
+
+            roots.append(offset)
+            depth = max(depth, tree.max_depth)
+            offset += n_nodes
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            classes=forest.classes_,
+            depth=depth,
+            n_features=forest.n_features_in_,
+        )
+
+    def apply(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.roots.shape[0]))
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]))
+        for tree in range(leaves.shape[1]):
+            proba += self.value[leaves[:, tree]]
+        proba /= leaves.shape[1]
+        if self.value_scale != 1.0:
+            proba /= self.value_scale
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.feature, self.threshold, self.left, self.right, self.value, self.roots))
+
+    def _node_depths(self, roots):
+        depths = np.full(self.feature.shape[0], -1, dtype=np.intp)
+        frontier = np.asarray(roots)
+        level = 0
+        while frontier.size:
+            depths[frontier] = level
+            children = np.concatenate([self.left[frontier], self.right[frontier]])
+            frontier = np.unique(children[depths[children] == -1])
+            level += 1
+        return depths
+
+    def compress(self, trees=None, depth=None, float32=False, quantize=None):
+        """Return a smaller, approximate copy of the forest.
+
+        trees keeps only the first n estimators, depth turns every node at
+        that depth into a leaf (its class distribution is already stored),
+        float32 stores thresholds in single precision and quantize stores
+        node values as unsigned integers of that many bits. Index arrays are
+        narrowed to int32 and unreachable nodes dropped in all cases. Only
+        the unmodified forest is guaranteed to match sklearn exactly.
+        """
+        if quantize is not None and not 1 <= quantize <= 16:
+            # Node values are stored in at most 16 bits
+            raise ValueError(f"quantize must be between 1 and 16 bits, got {quantize}")
+        roots = self.roots[:trees] if trees else self.roots
+        left, right = self.left.copy(), self.right.copy()
+        if depth is not None:
+            cut = self._node_depths(roots) == depth
+            left[cut] = np.flatnonzero(cut)
+            right[cut] = np.flatnonzero(cut)
+
+        # Keep only the nodes still reachable from the kept roots
+        pruned = CompiledForest(self.feature, self.threshold, left, right, self.value,
+                                roots, self.classes_, self.depth, self.n_features_in_)
+        depths = pruned._node_depths(roots)
+        keep = np.flatnonzero(depths >= 0)
+        remap = np.full(self.feature.shape[0], -1, dtype=np.int64)
+        remap[keep] = np.arange(keep.shape[0])
+
+        threshold = self.threshold[keep]
+        if float32:
+            threshold = threshold.astype(np.float32)
+        value = self.value[keep]
+        value_scale = self.value_scale
+        if quantize:
+            levels = 2 ** quantize - 1
+            dtype = np.uint8 if quantize <= 8 else np.uint16
+            value = np.rint(value / self.value_scale * levels).astype(dtype)
+            value_scale = float(levels)
+
+        return CompiledForest(
+            feature=self.feature[keep].astype(np.int32),
+            threshold=threshold,
+            left=remap[left[keep]].astype(np.int32),
+            right=remap[right[keep]].astype(np.int32),
+            value=value,
+            roots=remap[roots].astype(np.int32),
+            classes=self.classes_,
+            depth=int(depths.max()),
+            n_features=self.n_features_in_,
+            value_scale=value_scale,
+        )
+
+
+def compile_forest(model):
+    # Anything that is not a fitted random forest is returned unchanged
+    if hasattr(model, "estimators_") and all(hasattr(e, "tree_") for e in model.estimators_):
+        return CompiledForest.from_sklearn(model)
+    return model
@@ -0,0 +1,191 @@
+# utils/indexes.py
+
+from datetime import datetime
+from typing import Dict, List
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# Indexes the API's queries need, by collection. Only key patterns a
+# collection does not have yet are created, so this is safe on every start.
+# An index that adds constraints to existing keys gets its own name; it is
+# built next to the old one, which is dropped once the new one exists.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "appointments": [
+        IndexModel([("doctor_id", ASCENDING), ("appointment_time", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING)]),
+        # Notifications list every accepted appointment
+        IndexModel([("status", ASCENDING)]),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING), ("password", ASCENDING)]),
+        IndexModel([("username", ASCENDING)]),
+    ],
+    "doctors": [
+        IndexModel([("email", ASCENDING), ("password", ASCENDING)]),
+        IndexModel([("username", ASCENDING)]),
+    ],
+    "chats": [
+        IndexModel([("room_id", ASCENDING)]),
+    ],
+    "prescriptions": [
+        IndexModel([("doctor_id", ASCENDING)]),
+    ],
+    "fs.files": [
+        IndexModel([("user_id", ASCENDING), ("filename", ASCENDING)]),
+    ],
+    "predictions": [
+        # Outbreak checks read the predictions recorded since the last one
+        IndexModel([("created_at", ASCENDING)]),
+        IndexModel([("prediction", ASCENDING)]),
+    ],
+    "outbreaks": [
+        # At most one active outbreak per disease and window, however many monitors run
+        IndexModel([("disease", ASCENDING), ("window_hours", ASCENDING), ("status", ASCENDING)],
+                   name="active_outbreak_unique", unique=True, partialFilterExpression={"status": "active"}),
+        IndexModel([("status", ASCENDING), ("detected_at", DESCENDING)]),
+    ],
+    "disease_counters": [
+        IndexModel([("bucket", ASCENDING), ("day", ASCENDING), ("region", ASCENDING)]),
+        IndexModel([("bucket", ASCENDING), ("region", ASCENDING)]),
+    ],
+}
+
+# The filters and sorts the routers and background jobs run, with
+# placeholder values; only the fields and their types matter to the planner.
+QUERY_SHAPES = [
+    ("appointments", {"doctor_id": ObjectId(), "appointment_time": datetime(2000, 1, 1)}, None),
+    ("appointments", {"doctor_id": ObjectId()}, None),
+    ("appointments", {"doctor_id": ObjectId(), "status": "accepted"}, None),
+    ("appointments", {"user_id": ObjectId()}, None),
+    ("appointments", {"user_id": ObjectId(), "status": "accepted"}, None),
+    ("appointments", {"user_id": ObjectId(), "status": {"$in": ["accepted", "rejected"]}}, None),
+    ("appointments", {"status": "accepted"}, None),
+    ("users", {"email": "", "password": ""}, None),
+    ("users", {"username": ""}, None),
+    ("doctors", {"email": "", "password": ""}, None),
+    ("doctors", {"username": ""}, None),
+    ("chats", {"room_id": ""}, None),
+    ("prescriptions", {"doctor_id": ""}, None),
+    ("fs.files", {"user_id": ObjectId()}, None),
+    ("fs.files", {"user_id": ObjectId(), "filename": ""}, None),
+    ("predictions", {"created_at": {"$gte": datetime(2000, 1, 1), "$lte": datetime(2000, 1, 2)}}, [("created_at", 1)]),
+    ("predictions", {"prediction": ""}, None),
+    ("outbreaks", {"disease": "", "window_hours": 24.0, "status": "active"}, None),
+    ("outbreaks", {"status": "active"}, [("detected_at", -1)]),
+    ("outbreaks", {"window_hours": 24.0, "status": "active", "disease": {"$nin": [""]}}, None),
+    ("disease_counters", {"bucket": "day", "day": ""}, None),
+    ("disease_counters", {"bucket": "region", "region": ""}, None),
+    ("disease_counters", {"bucket": "day_region", "day": "", "region": ""}, None),
+]
+
+
+# Options that change what an index enforces
+CONSTRAINTS = ("unique", "partialFilterExpression")
+
+
+def key_pattern(key) -> tuple:
+    # Servers may report directions as floats
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                 for field, direction in key)
+
+
+def constraints(index: dict) -> dict:
+    return {option: index[option] for option in CONSTRAINTS if index.get(option)}
+
+
+def duplicate_keys(collection, model: IndexModel, limit: int = 10) -> List[dict]:
+    """Key values held by more than one document the unique index would cover."""
+    document = model.document
+    fields = [field for field in document["key"]]
+    return [group["_id"] for group in collection.aggregate([
+        {"$match": document.get("partialFilterExpression", {})},
+        {"$group": {"_id": {field.replace(".", "_"): f"${field}" for field in fields}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit},
+    ])]
+
+
+def ensure_collection_indexes(collection, models: List[IndexModel]) -> List[str]:
+    indexes = collection.index_information()
+    missing, superseded = [], []
+    for model in models:
+        document = model.document
+        key = key_pattern(document["key"].items())
+        # Matched on keys, not names, so indexes created by hand are not duplicated
+        same_keys = [name for name, info in indexes.items() if key_pattern(info["key"]) == key]
+        if any(constraints(indexes[name]) == constraints(document) for name in same_keys):
+            continue
+        if document["name"] in indexes:
+            print(f"Index {collection.name}.{document['name']} exists without {constraints(document)}; "
+                  f"give the declared one another name to replace it")
+            continue
+        if document.get("unique"):
+            duplicates = duplicate_keys(collection, model)
+            if duplicates:
+                print(f"Not creating unique index {collection.name}.{document['name']}, "
+                      f"documents share the keys {duplicates}")
+                continue
+        missing.append(model)
+        superseded += same_keys
+
+    created = collection.create_indexes(missing) if missing else []
+    # Only once the replacement exists; another instance may have dropped it already
+    for name in superseded:
+        try:
+            collection.drop_index(name)
+            print(f"Dropped index {collection.name}.{name}, superseded by a constrained one")
+        except OperationFailure as e:
+            print(f"Could not drop index {collection.name}.{name}: {e}")
+    return created
+
+
+def ensure_indexes(db, indexes: Dict[str, List[IndexModel]] = INDEXES) -> List[str]:
+    """Create the declared indexes that are missing; returns the created ones."""
+    created = []
+    for name, models in indexes.items():
+        # A failure on one collection does not keep the others from their indexes
+        try:
+            created += [f"{name}.{index}" for index in ensure_collection_indexes(db[name], models)]
+        except Exception as e:
+            print(f"Could not create indexes on {name}: {e}")
+    return created
+
+
+def plan_stages(plan: dict) -> List[str]:
+    # Newer servers wrap the classic plan tree in queryPlan
+    plan = plan.get("queryPlan", plan)
+    stages = [plan["stage"]] if "stage" in plan else []
+    children = [plan["inputStage"]] if "inputStage" in plan else []
+    for child in children + plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+
+def explain_query_shapes(db, shapes=QUERY_SHAPES) -> List[dict]:
+    report = []
+    for name, query, sort in shapes:
+        cursor = db[name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        stages = plan_stages(cursor.explain()["queryPlanner"]["winningPlan"])
+        report.append({
+            "collection": name,
+            "filter": list(query),
+            "sort": [field for field, direction in sort or []],
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return report
+
+
+def collection_scans(db) -> List[dict]:
+    return [shape for shape in explain_query_shapes(db) if shape["collscan"]]
+
+
+def bootstrap_indexes(db):
+    for index in ensure_indexes(db):
+        print(f"Created index {index}")
+    for shape in collection_scans(db):
+        print(f"COLLSCAN on {shape['collection']} for filter {shape['filter']} sort {shape['sort']}")
@@ -0,0 +1,248 @@
+# utils/inference.py
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+from fastapi import HTTPException
+
+from utils.batching import MicroBatcher
+from utils.cache import TTLCache
+from utils.model_registry import ensemble_predict, registry
+
+BATCH_MAX_ROWS = int(os.environ.get("BATCH_MAX_ROWS", "32"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "2"))
+# Processes evaluating models, 0 runs inference in the default thread pool
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "2"))
+# Rows waiting for a result across all models before new ones are refused
+INFERENCE_MAX_QUEUE = int(os.environ.get("INFERENCE_MAX_QUEUE", "512"))
+# Batches of one model evaluated at the same time
+INFERENCE_MODEL_CONCURRENCY = int(os.environ.get("INFERENCE_MODEL_CONCURRENCY", str(max(INFERENCE_WORKERS, 1))))
+# Longest a worker waits for the others while they all load a new model version
+INFERENCE_SYNC_TIMEOUT = float(os.environ.get("INFERENCE_SYNC_TIMEOUT", "120"))
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "3600"))
+
+
+def predict_rows(name: str, X: np.ndarray):
+    return registry.get(name).predict(X)
+
+
+def predict_symptom_rows(X: np.ndarray):
+    return ensemble_predict(registry.get("symptom"), X)
+
+
+def batch_function(name: str):
+    if name == "symptom":
+        return predict_symptom_rows
+    return partial(predict_rows, name)
+
+
+_worker_barrier = None
+
+
+def _init_worker(barrier):
+    global _worker_barrier
+    _worker_barrier = barrier
+    registry.load_all()
+
+
+def _sync_worker(versions: dict):
+    # Load the versions the API process serves, then hold this worker until
+    # every other one has taken its call too, so each worker runs exactly one
+    for name, version in versions.items():
+        try:
+            if registry.entry(name).version != version:
+                registry.load(name)
+        except Exception as e:
+            print(f"Worker {os.getpid()} could not load model {name}: {e}")
+    try:
+        _worker_barrier.wait(INFERENCE_SYNC_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass
+
+
+def _predict_in_worker(name: str, version: str, X: np.ndarray):
+    # Only when the background sync did not reach this worker in time
+    if registry.entry(name).version != version:
+        registry.load(name)
+    return batch_function(name)(X)
+
+
+class InferenceExecutor:
+    """Runs batched predictions in worker processes so the event loop stays free."""
+
+    def __init__(self, workers: int, max_queue: int, model_concurrency: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        # A quarter of the queue, so single rows still find room beside a batch
+        self.batch_slice = max(max_queue // 4, 1)
+        self._capacity = None
+        self.model_concurrency = model_concurrency
+        self._pool = None
+        self._barrier = None
+        self._loop = None
+        # name -> task loading a reloaded model into every worker
+        self._syncs = {}
+        # Created on first use so they bind to the server's event loop
+        self._limits = {}
+        self.batchers = {
+            name: MicroBatcher(partial(self._run_batch, name), BATCH_MAX_ROWS, BATCH_MAX_WAIT_MS / 1000)
+            for name in registry.specs
+        }
+
+    async def start(self):
+        if self.workers > 0:
+            context = multiprocessing.get_context("spawn")
+            self._barrier = context.Barrier(self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._barrier,),
+            )
+            self._loop = asyncio.get_running_loop()
+            # Workers start, and load every model, on their first call; do
+            # that here instead of in the first requests
+            await self._sync_workers({})
+
+    def shutdown(self):
+        if self._pool is not None:
+            # Release workers still waiting for a sync
+            self._barrier.abort()
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def _sync_workers(self, versions: dict):
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*[loop.run_in_executor(self._pool, _sync_worker, versions)
+                                   for _ in range(self.workers)])
+        except Exception as e:
+            print(f"Could not sync the inference workers: {e}")
+        if self._barrier.broken:
+            print(f"Not every inference worker synced within {INFERENCE_SYNC_TIMEOUT}s")
+            self._barrier.reset()
+
+    def model_reloaded(self, name, entry):
+        # Called on the registry's loading thread; the workers load the new
+        # version in the background, predictions for it wait until they have
+        if self._pool is not None:
+            self._loop.call_soon_threadsafe(self._start_sync, name, entry.version)
+
+    def _start_sync(self, name: str, version: str):
+        if self._pool is not None:
+            self._syncs[name] = asyncio.ensure_future(self._sync_workers({name: version}))
+
+    async def _run_batch(self, name: str, X: np.ndarray):
+        loop = asyncio.get_running_loop()
+        if name not in self._limits:
+            self._limits[name] = asyncio.Semaphore(self.model_concurrency)
+        async with self._limits[name]:
+            if self._pool is None:
+                return await loop.run_in_executor(None, batch_function(name), X)
+            sync = self._syncs.get(name)
+            if sync is not None and not sync.done():
+                await asyncio.wait([sync])
+            version = registry.entry(name).version
+            return await loop.run_in_executor(self._pool, _predict_in_worker, name, version, X)
+
+    def _queue_condition(self):
+        # Created on first use so it binds to the server's event loop
+        if self._capacity is None:
+            self._capacity = asyncio.Condition()
+        return self._capacity
+
+    async def _release(self, rows: int):
+        self.pending -= rows
+        condition = self._queue_condition()
+        async with condition:
+            condition.notify_all()
+
+    async def predict(self, name: str, row):
+        # A single row is refused at once when the queue is full
+        if self.pending >= self.max_queue:
+            raise HTTPException(status_code=503, detail="Prediction service is busy, please retry")
+        self.pending += 1
+        try:
+            # Concurrent requests for the same model share one vectorized predict
+            return await self.batchers[name].submit(row)
+        finally:
+            await self._release(1)
+
+    async def predict_batch(self, name: str, X: np.ndarray):
+        # Callers that already hold a matrix skip the micro-batcher. Every
+        # row counts against the queue bound; the matrix goes through in
+        # slices, each waiting until the queue has room for it, so other
+        # requests in flight delay a batch instead of failing it.
+        X = np.asarray(X)
+        if len(X) == 0:
+            return await self._run_batch(name, X)
+        results = []
+        for start in range(0, len(X), self.batch_slice):
+            part = X[start:start + self.batch_slice]
+            condition = self._queue_condition()
+            async with condition:
+                await condition.wait_for(lambda: self.pending + len(part) <= self.max_queue)
+                self.pending += len(part)
+            try:
+                results.append(np.asarray(await self._run_batch(name, part)))
+            finally:
+                await self._release(len(part))
+        return np.concatenate(results)
+
+
+executor = InferenceExecutor(INFERENCE_WORKERS, INFERENCE_MAX_QUEUE, INFERENCE_MODEL_CONCURRENCY)
+registry.add_listener(executor.model_reloaded)
+
+
+prediction_cache = TTLCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+
+
+def clear_prediction_cache(name, entry):
+    prediction_cache.clear()
+
+
+registry.add_listener(clear_prediction_cache)
+
+
+def canonical_key(name: str, row):
+    if name == "symptom":
+        # Only which symptoms are present matters, not how they were spelled
+        return frozenset(np.flatnonzero(row).tolist())
+    return tuple(float(value) for value in row)
+
+
+async def predict(name: str, row):
+    # The models are deterministic, so identical inputs for the same model
+    # version can reuse an earlier answer
+    key = (name, registry.entry(name).version, canonical_key(name, row))
+    found, value = prediction_cache.get(key)
+    if found:
+        return value
+    value = await executor.predict(name, row)
+    prediction_cache.set(key, value)
+    return value
+
+
+async def predict_batch(name: str, X: np.ndarray):
+    version = registry.entry(name).version
+    keys = [(name, version, canonical_key(name, row)) for row in X]
+    results = [None] * len(keys)
+    missing = []
+    for i, key in enumerate(keys):
+        found, value = prediction_cache.get(key)
+        if found:
+            results[i] = value
+        else:
+            missing.append(i)
+    if missing:
+        for i, value in zip(missing, await executor.predict_batch(name, np.asarray(X)[missing])):
+            results[i] = value
+            prediction_cache.set(keys[i], value)
+    return np.asarray(results)
@@ -0,0 +1,139 @@
+# utils/llm.py
+
+import asyncio
+import os
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1")
+OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "text-davinci-003")
+# Deadline for one completion, including the wait for a free slot
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "10"))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get("LLM_BREAKER_RESET_SECONDS", "30"))
+
+
+class LLMUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Stops calling the provider after repeated failures.
+
+    After max_failures consecutive failures the breaker opens and calls fail
+    fast for reset_seconds. Then a single trial call is let through: success
+    closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, max_failures: int, reset_seconds: float):
+        self.max_failures = max_failures
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial:
+            self.trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial = False
+        if self.opened_at is not None or self.failures >= self.max_failures:
+            self.opened_at = time.monotonic()
+
+
+class LLMClient:
+    """Completions over one pooled async HTTP client."""
+
+    def __init__(self, base_url: str = OPENAI_BASE_URL, api_key: str = OPENAI_API_KEY,
+                 model: str = OPENAI_MODEL, timeout: float = LLM_TIMEOUT_SECONDS,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+        self.client = None
+        self.limit = None
+
+    def start(self):
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency,
+                                max_keepalive_connections=self.max_concurrency),
+        )
+        self.limit = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _post(self, payload: dict) -> dict:
+        async with self.limit:
+            response = await self.client.post("/completions", json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def complete(self, prompt: str, **params) -> str:
+        if self.client is None:
+            self.start()
+        if not self.breaker.allow():
+            raise LLMUnavailable("circuit open")
+
+        payload = {"model": self.model, "prompt": prompt, **params}
+        try:
+            body = await asyncio.wait_for(self._post(payload), self.timeout)
+            text = body["choices"][0]["text"].strip()
+        except asyncio.CancelledError:
+            # The caller went away, let the next request be the trial
+            self.breaker.trial = False
+            raise
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            raise LLMUnavailable(f"no response within {self.timeout}s")
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as exc:
+            self.breaker.record_failure()
+            raise LLMUnavailable(str(exc) or type(exc).__name__)
+        self.breaker.record_success()
+        return text
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout,
+        }
+
+
+llm_client = LLMClient()
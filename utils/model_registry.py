@@ -0,0 +1,295 @@
+# utils/model_registry.py
+
+import asyncio
+import hashlib
+import os
+import pickle
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from utils.artifacts import artifact_path, load_artifact, read_manifest
+from utils.forest import compile_forest
+
+# Models whose random forests are evaluated by the compiled array engine
+# instead of sklearn, e.g. "heart,liver,symptom"
+COMPILED_MODELS = {
+    name.strip() for name in os.environ.get("COMPILED_MODELS", "").split(",") if name.strip()
+}
+
+
+def load_pickle(path: str):
+    with open(path, 'rb') as file:
+        model = pickle.load(file, fix_imports=True, encoding='latin1')
+    return model
+
+
+def file_version(path: str) -> str:
+    # Content hash, so a retrained artifact gets a new version even if the
+    # file name stays the same
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def file_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def warmup_predict(model, n_features: int):
+    model.predict(np.zeros((1, n_features)))
+
+
+def warmup_ensemble(models, n_features: int):
+    for model in models[:3]:
+        model.predict(np.zeros((1, n_features)))
+
+
+def majority_vote(rf_labels, nb_labels, svm_labels):
+    # Same result as scipy's mode over three votes: the label at least two
+    # models agree on, otherwise the smallest one
+    return np.where(
+        (rf_labels == nb_labels) | (rf_labels == svm_labels), rf_labels,
+        np.where(nb_labels == svm_labels, nb_labels,
+                 np.minimum(np.minimum(rf_labels, nb_labels), svm_labels)))
+
+
+def ensemble_predict(models, X):
+    # Disease names for rows of symptom vectors, as served by /predict
+    final_rf_model, final_nb_model, final_svm_model, data_dict = models
+    votes = majority_vote(final_rf_model.predict(X),
+                          final_nb_model.predict(X),
+                          final_svm_model.predict(X))
+    return np.asarray(data_dict["predictions_classes"])[votes]
+
+
+SYMPTOM_TEST_DATA = "prediction/Testing.csv"
+SYMPTOM_MIN_ACCURACY = float(os.environ.get("SYMPTOM_MIN_ACCURACY", "0.9"))
+
+
+def validate_ensemble(models):
+    final_rf_model, final_nb_model, final_svm_model, data_dict = models
+    test_data = pd.read_csv(SYMPTOM_TEST_DATA).dropna(axis=1)
+    test_X = test_data.iloc[:, :-1]
+    if test_X.shape[1] != len(data_dict["symptom_index"]):
+        raise ValueError(f"Model expects {len(data_dict['symptom_index'])} symptoms, test data has {test_X.shape[1]}")
+
+    votes = majority_vote(final_rf_model.predict(test_X),
+                          final_nb_model.predict(test_X),
+                          final_svm_model.predict(test_X))
+    predicted = np.asarray(data_dict["predictions_classes"])[votes]
+    accuracy = float(np.mean(predicted == test_data.iloc[:, -1].values))
+    if accuracy < SYMPTOM_MIN_ACCURACY:
+        raise ValueError(f"Accuracy {accuracy:.3f} on {SYMPTOM_TEST_DATA} is below {SYMPTOM_MIN_ACCURACY}")
+
+
+def compile_model(model):
+    # The symptom artifact is a (rf, nb, svm, data_dict) tuple
+    if isinstance(model, tuple):
+        return (compile_forest(model[0]),) + model[1:]
+    return compile_forest(model)
+
+
+@dataclass
+class ModelSpec:
+    name: str
+    path: str
+    n_features: int
+    loader: Callable[[str], Any] = load_pickle
+    warmup: Callable[[Any, int], None] = warmup_predict
+    validate: Optional[Callable[[Any], None]] = None
+
+
+@dataclass
+class LoadedModel:
+    spec: ModelSpec
+    model: Any
+    path: str
+    version: str
+    engine: str
+    mtime: float
+    loaded_at: datetime
+    load_seconds: float
+    warmup_seconds: float
+
+    def metadata(self) -> dict:
+        return {
+            "name": self.spec.name,
+            "path": self.path,
+            "version": self.version,
+            "engine": self.engine,
+            "loaded_at": self.loaded_at.isoformat(),
+            "load_seconds": round(self.load_seconds, 6),
+            "warmup_seconds": round(self.warmup_seconds, 6),
+        }
+
+
+class ModelRegistry:
+    """Keeps every model artifact deserialized once and shared by all requests.
+
+    Reloads build the replacement completely (load, warm up, validate) before
+    swapping it in with a single assignment, so a request either gets the old
+    model or the new one, never a half-loaded one.
+    """
+
+    def __init__(self, specs: Dict[str, ModelSpec]):
+        self.specs = specs
+        self._models: Dict[str, LoadedModel] = {}
+        self._reload_locks = {name: threading.Lock() for name in specs}
+        # (pickle, artifact) mtimes of the last load attempt, so a broken
+        # model is not retried on every poll
+        self._attempted: Dict[str, tuple] = {}
+        # name -> (pickle mtime, content hash), hashing is only redone when
+        # the pickle changes
+        self._pickle_versions: Dict[str, tuple] = {}
+        self._listeners = []
+
+    def add_listener(self, listener: Callable[[str, "LoadedModel"], None]):
+        # Called with (name, entry) after a model has been (re)loaded
+        self._listeners.append(listener)
+
+    def mtimes(self, spec: ModelSpec) -> tuple:
+        return file_mtime(spec.path), file_mtime(artifact_path(spec.name))
+
+    def pickle_version(self, spec: ModelSpec) -> Optional[str]:
+        mtime = file_mtime(spec.path)
+        if mtime is None:
+            return None
+        cached = self._pickle_versions.get(spec.name)
+        if cached is None or cached[0] != mtime:
+            cached = self._pickle_versions[spec.name] = (mtime, file_version(spec.path))
+        return cached[1]
+
+    def source(self, spec: ModelSpec) -> str:
+        # A converted memory-mapped artifact takes precedence over the
+        # pickle, as long as it was exported from the pickle being served
+        path = artifact_path(spec.name)
+        if not os.path.exists(path):
+            return spec.path
+        pickle_version = self.pickle_version(spec)
+        if pickle_version is None:
+            return path
+        # Compressed exports append their variant to the pickle's hash
+        exported_from = (read_manifest(path).get("source_version") or "").split("-")[0]
+        if exported_from != pickle_version:
+            print(f"Artifact for {spec.name} was exported from another version of {spec.path}, "
+                  f"loading the pickle; rerun python -m utils.artifacts {spec.name}")
+            return spec.path
+        return path
+
+    def _load(self, spec: ModelSpec) -> LoadedModel:
+        self._attempted[spec.name] = self.mtimes(spec)
+        path = self.source(spec)
+        mtime = os.stat(path).st_mtime
+        start = time.perf_counter()
+        if path != spec.path:
+            model = load_artifact(path)
+            engine = "mmap"
+        else:
+            model = spec.loader(path)
+            engine = "sklearn"
+        if engine == "sklearn" and spec.name in COMPILED_MODELS:
+            model = compile_model(model)
+            engine = "compiled"
+        loaded = time.perf_counter()
+        spec.warmup(model, spec.n_features)
+        warmed = time.perf_counter()
+        if spec.validate is not None:
+            spec.validate(model)
+        return LoadedModel(
+            spec=spec,
+            model=model,
+            path=path,
+            version=file_version(path),
+            engine=engine,
+            mtime=mtime,
+            loaded_at=datetime.utcnow(),
+            load_seconds=loaded - start,
+            warmup_seconds=warmed - loaded,
+        )
+
+    def load(self, name: str) -> LoadedModel:
+        # One load per model at a time; readers never take this lock
+        with self._reload_locks[name]:
+            entry = self._load(self.specs[name])
+            self._models[name] = entry
+        for listener in self._listeners:
+            try:
+                listener(name, entry)
+            except Exception as e:
+                print(f"Model listener failed for {name}: {e}")
+        return entry
+
+    def load_all(self):
+        for name in self.specs:
+            try:
+                entry = self.load(name)
+                print(f"Loaded model {name} ({entry.version}) in {entry.load_seconds:.3f}s")
+            except Exception as e:
+                print(f"Could not load model {name}: {e}")
+
+    async def reload(self, name: str) -> LoadedModel:
+        # Deserialization is CPU bound, keep it off the event loop
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(None, self.load, name)
+        print(f"Reloaded model {name} ({entry.version})")
+        return entry
+
+    def changed(self):
+        changed = []
+        for name, spec in self.specs.items():
+            # Either file may change: a retrained pickle makes the artifact stale
+            mtimes = self.mtimes(spec)
+            if mtimes != (None, None) and mtimes != self._attempted.get(name):
+                changed.append(name)
+        return changed
+
+    async def watch(self, interval: float):
+        # Poll the pickles and artifacts and reload any that were replaced on disk
+        while True:
+            await asyncio.sleep(interval)
+            for name in self.changed():
+                try:
+                    await self.reload(name)
+                except Exception as e:
+                    print(f"Could not reload model {name}, keeping the current one: {e}")
+
+    def entry(self, name: str) -> LoadedModel:
+        entry = self._models.get(name)
+        if entry is None:
+            # Startup did not load it (or failed), try again on first use
+            entry = self.load(name)
+        return entry
+
+    def get(self, name: str):
+        return self.entry(name).model
+
+    def metadata(self) -> Dict[str, Optional[dict]]:
+        return {
+            name: (self._models[name].metadata() if name in self._models else None)
+            for name in self.specs
+        }
+
+
+MODEL_SPECS = {
+    "cancer": ModelSpec("cancer", "prediction/cancer.pkl", n_features=5),
+    "diabetes": ModelSpec("diabetes", "prediction/diabetes.pkl", n_features=6),
+    "heart": ModelSpec("heart", "prediction/heart.pkl", n_features=7),
+    "liver": ModelSpec("liver", "prediction/liver.pkl", n_features=7),
+    "symptom": ModelSpec("symptom", "prediction/prediction.pkl", n_features=132,
+                         loader=joblib.load, warmup=warmup_ensemble,
+                         validate=validate_ensemble),
+}
+
+registry = ModelRegistry(MODEL_SPECS)
@@ -0,0 +1,423 @@
+# utils/outbreak.py
+
+import asyncio
+import heapq
+import math
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from geopy.distance import geodesic
+from pymongo.errors import DuplicateKeyError
+from scipy import sparse
+from sklearn.cluster import DBSCAN
+
+from database import run_db
+
+# Lower bounds on the WGS84 length of one degree, so a cell is never
+# narrower than the distance it has to cover
+KM_PER_DEGREE_LATITUDE = 110.574
+KM_PER_DEGREE_LONGITUDE = 111.319
+EARTH_RADIUS_KM = 6371.0088
+# The spherical distance is within 0.6% of the WGS84 geodesic one
+HAVERSINE_TOLERANCE = 0.01
+MIN_BLOCK_POINTS = 128
+
+
+def infective_disease(dis: str) -> bool:
+    dis_index = ["fungus", "fungal", "flu", "bacteria",
+                 "bacterial", "virus", "viral", "corona", "covid"]
+    for di in dis_index:
+        if di in dis:
+            return True
+
+    return False
+
+
+def coordinates(location) -> Optional[Tuple[float, float]]:
+    try:
+        lat, lon = float(location["latitude"]), float(location["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return lat, lon
+
+
+def haversine_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def within_km(a: Tuple[float, float], b: Tuple[float, float], distance_km: float) -> bool:
+    # Same answer as geodesic(a, b).kilometers <= distance_km, which is
+    # only computed when the cheap spherical distance is too close to call
+    approximate = haversine_km(a, b)
+    if approximate > distance_km * (1 + HAVERSINE_TOLERANCE):
+        return False
+    if approximate < distance_km * (1 - HAVERSINE_TOLERANCE):
+        return True
+    return geodesic(a, b).kilometers <= distance_km
+
+
+class DiseaseCells:
+    """Locations of one disease, bucketed into a lat/lon grid."""
+
+    def __init__(self):
+        self.count = 0
+        self.points = {}
+        self.cells = {}
+        # Other points within the distance threshold of each point
+        self.neighbours = {}
+        self.pairs = 0
+
+
+class OutbreakDetector:
+    """Incremental version of the outbreak check over a set of predictions.
+
+    A disease is an outbreak when it was predicted at least count_threshold
+    times, twice the number of location pairs closer than distance_km is at
+    least location_threshold and it is infective. Locations are kept in a
+    grid of cells distance_km high, so adding a location only measures it
+    against the points in its own and the neighbouring cells instead of
+    every stored location, and removing one only touches its neighbours.
+    """
+
+    def __init__(self, distance_km: float = 10.0, count_threshold: int = 3, location_threshold: int = 2):
+        self.distance_km = distance_km
+        self.count_threshold = count_threshold
+        self.location_threshold = location_threshold
+        self.cell_degrees = distance_km / KM_PER_DEGREE_LATITUDE
+        self.n_columns = math.ceil(360.0 / self.cell_degrees)
+        self.diseases: Dict[str, DiseaseCells] = {}
+        self.next_id = 0
+
+    def cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor((lon + 180.0) / self.cell_degrees) % self.n_columns
+
+    def neighbour_cells(self, lat: float, lon: float):
+        row, column = self.cell(lat, lon)
+        # Degrees of longitude shrink towards the poles, so more columns are
+        # needed to cover distance_km there
+        far_latitude = min(abs(lat) + self.cell_degrees, 90.0)
+        km_per_degree = KM_PER_DEGREE_LONGITUDE * math.cos(math.radians(far_latitude))
+        span = self.n_columns // 2
+        if km_per_degree * 360.0 > self.distance_km * 3:
+            # A little extra for the great circle bending towards the pole
+            span = min(span, math.ceil(self.distance_km * 1.01 / km_per_degree / self.cell_degrees))
+        columns = {(column + offset) % self.n_columns for offset in range(-span, span + 1)}
+        for r in (row - 1, row, row + 1):
+            for c in columns:
+                yield r, c
+
+    def add(self, disease: str, location) -> int:
+        """Record one prediction; returns an id to remove it with."""
+        cells = self.diseases.setdefault(disease, DiseaseCells())
+        cells.count += 1
+        point_id = self.next_id
+        self.next_id += 1
+
+        point = coordinates(location) if location is not None else None
+        cells.points[point_id] = (point, location)
+        if point is not None:
+            neighbours = set()
+            for key in self.neighbour_cells(*point):
+                for other in cells.cells.get(key, ()):
+                    if within_km(point, cells.points[other][0], self.distance_km):
+                        neighbours.add(other)
+                        cells.neighbours[other].add(point_id)
+            cells.neighbours[point_id] = neighbours
+            cells.pairs += len(neighbours)
+            cells.cells.setdefault(self.cell(*point), set()).add(point_id)
+        return point_id
+
+    def remove(self, disease: str, point_id: int):
+        cells = self.diseases[disease]
+        cells.count -= 1
+        point, location = cells.points.pop(point_id)
+        if point is not None:
+            cells.cells[self.cell(*point)].discard(point_id)
+            for other in cells.neighbours.pop(point_id):
+                cells.neighbours[other].discard(point_id)
+                cells.pairs -= 1
+        if cells.count == 0:
+            del self.diseases[disease]
+
+    def is_outbreak(self, disease: str, cells: DiseaseCells) -> bool:
+        return (cells.count >= self.count_threshold
+                and 2 * cells.pairs >= self.location_threshold
+                and infective_disease(disease))
+
+    def nearby_locations(self, disease: str) -> List[dict]:
+        cells = self.diseases[disease]
+        return [location for point_id, (point, location) in cells.points.items() if cells.neighbours.get(point_id)]
+
+    def outbreaks(self) -> List[Tuple[str, List[dict]]]:
+        return [(disease, self.nearby_locations(disease))
+                for disease, cells in self.diseases.items() if self.is_outbreak(disease, cells)]
+
+    def counts(self) -> Dict[str, int]:
+        return {disease: cells.count for disease, cells in self.diseases.items()}
+
+
+def haversine_matrix(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Distances in km between every point of one set and every point of another (radians)."""
+    dlat = lat2[None, :] - lat1[:, None]
+    dlon = lon2[None, :] - lon1[:, None]
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat1)[:, None] * np.cos(lat2)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(h)))
+
+
+def radius_graph(latitudes, longitudes, radius_km: float, block_size: int = 1024) -> sparse.csr_matrix:
+    """Sparse matrix of the haversine distances that are at most radius_km.
+
+    Points are put into latitude stripes radius_km high and sorted by
+    longitude inside them. A stripe is cut into blocks of at most block_size
+    points spanning about radius_km of longitude, and each block is only
+    compared with the points of the same and the two adjacent stripes within
+    reach of it. Work and memory follow the number of nearby pairs instead
+    of n squared.
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    n = lat.shape[0]
+    band = radius_km / EARTH_RADIUS_KM
+    stripe = np.floor(lat / band).astype(np.int64)
+    order = np.lexsort((lon, stripe))
+    stripe_ids, starts = np.unique(stripe[order], return_index=True)
+    ends = np.append(starts[1:], n)
+    bounds = {s: (start, end) for s, start, end in zip(stripe_ids.tolist(), starts, ends)}
+
+    rows, columns, distances = [], [], []
+    for s, (start, end) in bounds.items():
+        candidates = np.concatenate([order[slice(*bounds[t])] for t in (s - 1, s, s + 1) if t in bounds])
+        candidates = candidates[np.argsort(lon[candidates], kind="stable")]
+        candidate_lon = lon[candidates]
+        # Radians of longitude that radius_km can span at these latitudes
+        cos_far = np.cos(min(np.abs(lat[candidates]).max() + band, np.pi / 2))
+        reach = band * 1.01 / cos_far if cos_far > band else np.inf
+
+        stripe_lon = lon[order[start:end]]
+        block_start = start
+        while block_start < end:
+            # A block spans about reach in longitude, so its window stays
+            # narrow, but holds enough points to keep numpy busy
+            block_end = start + np.searchsorted(stripe_lon, lon[order[block_start]] + reach, side="right")
+            block_end = int(min(max(block_end, block_start + MIN_BLOCK_POINTS), block_start + block_size, end))
+            block = order[block_start:block_end]
+            block_start = block_end
+            low, high = lon[block[0]] - reach, lon[block[-1]] + reach
+            if high - low >= 2 * np.pi:
+                window = candidates
+            else:
+                # Longitudes wrap around at the antimeridian
+                ranges = [(low, high), (low + 2 * np.pi, high + 2 * np.pi), (low - 2 * np.pi, high - 2 * np.pi)]
+                window = np.concatenate([
+                    candidates[np.searchsorted(candidate_lon, a, side="left"):np.searchsorted(candidate_lon, b, side="right")]
+                    for a, b in ranges
+                ])
+            if window.size == 0:
+                continue
+            block_distances = haversine_matrix(lat[block], lon[block], lat[window], lon[window])
+            i, j = np.nonzero(block_distances <= radius_km)
+            # Each point counts itself as a neighbour in DBSCAN already
+            keep = block[i] != window[j]
+            rows.append(block[i[keep]])
+            columns.append(window[j[keep]])
+            distances.append(block_distances[i[keep], j[keep]])
+
+    if not rows:
+        return sparse.csr_matrix((n, n))
+    return sparse.csr_matrix((np.concatenate(distances), (np.concatenate(rows), np.concatenate(columns))),
+                             shape=(n, n))
+
+
+def centroid(latitudes, longitudes) -> Tuple[float, float]:
+    # Mean of the unit vectors, so clusters across the antimeridian work
+    lat, lon = np.radians(latitudes), np.radians(longitudes)
+    x, y, z = np.mean(np.cos(lat) * np.cos(lon)), np.mean(np.cos(lat) * np.sin(lon)), np.mean(np.sin(lat))
+    return math.degrees(math.atan2(z, math.hypot(x, y))), math.degrees(math.atan2(y, x))
+
+
+def cluster_locations(latitudes, longitudes, radius_km: float = 10.0, min_samples: int = 3) -> List[dict]:
+    """DBSCAN over haversine distances; one dict per cluster, largest first."""
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    if latitudes.shape[0] < min_samples:
+        return []
+    graph = radius_graph(latitudes, longitudes, radius_km)
+    labels = DBSCAN(eps=radius_km, min_samples=min_samples, metric="precomputed").fit(graph).labels_
+
+    clusters = []
+    for label in np.unique(labels[labels >= 0]):
+        members = labels == label
+        lat, lon = centroid(latitudes[members], longitudes[members])
+        spread = haversine_matrix(np.radians([lat]), np.radians([lon]),
+                                  np.radians(latitudes[members]), np.radians(longitudes[members]))
+        clusters.append({
+            "centroid": {"latitude": lat, "longitude": lon},
+            "members": int(members.sum()),
+            "radius_km": float(spread.max()),
+        })
+    clusters.sort(key=lambda cluster: cluster["members"], reverse=True)
+    return clusters
+
+
+def analyze_outbreaks(records: Iterable[dict], radius_km: float = 10.0, min_samples: int = 3,
+                      infective_only: bool = True) -> List[dict]:
+    """Cluster stored predictions per disease in one batch."""
+    points = {}
+    for record in records:
+        disease = record.get("prediction")
+        point = coordinates(record.get("location"))
+        if disease is None or point is None:
+            continue
+        if infective_only and not infective_disease(disease):
+            continue
+        points.setdefault(disease, []).append(point)
+
+    results = []
+    for disease, disease_points in points.items():
+        latitudes, longitudes = np.asarray(disease_points).T
+        for cluster in cluster_locations(latitudes, longitudes, radius_km, min_samples):
+            results.append({"disease": disease, **cluster})
+    results.sort(key=lambda cluster: cluster["members"], reverse=True)
+    return results
+
+
+def rem_dup_loc(locations: List[Dict[str, float]]) -> List[Dict[str, float]]:
+    unique_locations = []
+    unique_coordinates = set()
+
+    for location in locations:
+        lat, lon = location["latitude"], location["longitude"]
+        coordinate = (lat, lon)
+
+        if coordinate not in unique_coordinates:
+            unique_locations.append(location)
+            unique_coordinates.add(coordinate)
+
+    return unique_locations
+
+
+class OutbreakWindow:
+    """An OutbreakDetector over the predictions of the last `hours` hours."""
+
+    def __init__(self, hours: float, **criteria):
+        self.hours = hours
+        self.span = timedelta(hours=hours)
+        self.detector = OutbreakDetector(**criteria)
+        # (created_at, record id, disease, detector id), oldest first
+        self.entries = []
+
+    def add(self, record: dict):
+        point_id = self.detector.add(record["prediction"], record.get("location"))
+        heapq.heappush(self.entries, (record["created_at"], record["_id"], record["prediction"], point_id))
+
+    def expire(self, now: datetime) -> List:
+        expired = []
+        while self.entries and self.entries[0][0] < now - self.span:
+            created_at, record_id, disease, point_id = heapq.heappop(self.entries)
+            self.detector.remove(disease, point_id)
+            expired.append(record_id)
+        return expired
+
+
+class OutbreakMonitor:
+    """Evaluates outbreaks over sliding time windows on a fixed cadence.
+
+    Each check reads only the predictions recorded since the previous one,
+    adds them to every window and drops the ones that slid out. Outbreaks
+    are kept in the outbreaks collection, one document per disease and
+    window while active. alert() is called when a disease becomes active,
+    at most once per cooldown; the last alert time of each disease is kept
+    in the alerts collection, so this holds across restarts and instances.
+    """
+
+    def __init__(self, predictions, outbreaks, alerts, alert: Callable[[Tuple[str, List[dict]]], None],
+                 windows_hours: Iterable[float], interval: float, cooldown_hours: float,
+                 lag_seconds: float = 60.0, **criteria):
+        self.predictions = predictions
+        self.outbreaks = outbreaks
+        self.alerts = alerts
+        self.alert = alert
+        self.windows = [OutbreakWindow(hours, **criteria) for hours in sorted(windows_hours)]
+        self.interval = interval
+        self.cooldown = timedelta(hours=cooldown_hours)
+        # Re-read this far back so records committed late by other writers are not missed
+        self.lag = timedelta(seconds=lag_seconds)
+        self.last_check = None
+        self.seen = set()
+
+    def read_new(self, now: datetime) -> List[dict]:
+        since = now - self.windows[-1].span if self.last_check is None else self.last_check - self.lag
+        records = self.predictions.find(
+            {"created_at": {"$gte": since, "$lte": now}},
+            {"prediction": 1, "location": 1, "created_at": 1},
+        ).sort("created_at", 1)
+        self.last_check = now
+        return [record for record in records
+                if record["_id"] not in self.seen and record.get("prediction") is not None]
+
+    def check(self, now: datetime) -> List[Tuple[str, List[dict]]]:
+        """Update every window and the outbreaks collection; returns the alerts to send."""
+        records = self.read_new(now)
+        for window in self.windows:
+            for record in records:
+                window.add(record)
+            expired = window.expire(now)
+            if window is self.windows[-1]:
+                self.seen.update(record["_id"] for record in records)
+                self.seen.difference_update(expired)
+
+        alerts = {}
+        for window in self.windows:
+            active = window.detector.outbreaks()
+            for disease, locations in active:
+                locations = rem_dup_loc(locations)
+                query = {"disease": disease, "window_hours": window.hours, "status": "active"}
+                update = {"$set": {"last_seen_at": now, "count": window.detector.diseases[disease].count,
+                                   "locations": locations[:100]}}
+                try:
+                    result = self.outbreaks.update_one(
+                        query, {**update, "$setOnInsert": {"detected_at": now}}, upsert=True)
+                except DuplicateKeyError:
+                    # Another monitor inserted it first (unique on active
+                    # disease and window), so it is not new here
+                    self.outbreaks.update_one(query, update)
+                    continue
+                if result.upserted_id is not None:
+                    alerts.setdefault(disease, locations)
+            self.outbreaks.update_many(
+                {"window_hours": window.hours, "status": "active",
+                 "disease": {"$nin": [disease for disease, _ in active]}},
+                {"$set": {"status": "resolved", "resolved_at": now}},
+            )
+
+        return [(disease, locations) for disease, locations in alerts.items() if self.claim_alert(disease, now)]
+
+    def claim_alert(self, disease: str, now: datetime) -> bool:
+        # Matches only when the last alert is older than the cooldown; when
+        # it is recent the upsert collides on _id instead of inserting
+        try:
+            self.alerts.update_one(
+                {"_id": disease, "alerted_at": {"$lt": now - self.cooldown}},
+                {"$set": {"alerted_at": now}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def run(self):
+        while True:
+            try:
+                for outbreak in await run_db(self.check, datetime.utcnow()):
+                    print(f"Outbreak of {outbreak[0]} detected")
+                    await run_db(self.alert, outbreak)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                print(f"Outbreak check failed: {exc}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,218 @@
+# utils/sketches.py
+
+import hashlib
+import heapq
+import math
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.outbreak import coordinates
+
+NO_LOCATION = "-"
+
+
+class CountMinSketch:
+    """Approximate counts of arbitrary keys in width x depth counters.
+
+    An estimate never undercounts. With N counts added it overcounts by at
+    most e / width * N with probability at least 1 - exp(-depth).
+    """
+
+    def __init__(self, width: int, depth: int, table: Optional[np.ndarray] = None):
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else np.zeros((depth, width), dtype=np.int64)
+        self.total = int(self.table[0].sum())
+
+    def _columns(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=8 * self.depth).digest()
+        return [int.from_bytes(digest[8 * row:8 * row + 8], "little") % self.width for row in range(self.depth)]
+
+    def add(self, key: str, count: int = 1):
+        for row, column in enumerate(self._columns(key)):
+            self.table[row, column] += count
+        self.total += count
+
+    def estimate(self, key: str) -> int:
+        return int(min(self.table[row, column] for row, column in enumerate(self._columns(key))))
+
+    def error_bound(self) -> float:
+        return math.e / self.width * self.total
+
+
+class SpaceSaving:
+    """The most frequent keys of a stream, in at most capacity counters.
+
+    Every key counted more than N / capacity times is kept. A kept key's
+    count overestimates its true count by at most its recorded error, which
+    is itself at most N / capacity.
+    """
+
+    def __init__(self, capacity: int, counters: Optional[Dict[str, List[int]]] = None):
+        self.capacity = capacity
+        # key -> [count, error]
+        self.counters = counters if counters is not None else {}
+        # (count, key) entries, stale ones are skipped when popped
+        self.heap = [(count, key) for key, (count, error) in self.counters.items()]
+        heapq.heapify(self.heap)
+
+    def add(self, key: str, count: int = 1):
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.capacity:
+            counter = self.counters[key] = [count, 0]
+        else:
+            # The new key takes over the smallest counter
+            while True:
+                minimum, smallest = heapq.heappop(self.heap)
+                if self.counters.get(smallest, [None])[0] == minimum:
+                    break
+            del self.counters[smallest]
+            counter = self.counters[key] = [minimum + count, minimum]
+        heapq.heappush(self.heap, (counter[0], key))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(count, key) for key, (count, error) in self.counters.items()]
+            heapq.heapify(self.heap)
+
+    def top(self, n: int) -> List[Tuple[str, int, int]]:
+        ranked = sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)
+        return [(key, count, error) for key, (count, error) in ranked[:n]]
+
+
+def hour_bucket(when: datetime) -> int:
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return int(when.timestamp() // 3600)
+
+
+class CaseSketches:
+    """Fixed-memory case counts by (disease, grid cell, hour).
+
+    Every hour of the last retention_hours gets its own count-min sketch and
+    space-saving summary, so memory is retention_hours x (width x depth
+    counters + capacity keys) no matter how many predictions arrive.
+
+    Error bounds, with N the number of cases in the queried hours:
+    count() never undercounts, and overcounts by at most e / width * N with
+    probability 1 - exp(-depth) (0.13% of N with the default width of 2048,
+    98% likely with depth 4). heavy_hitters() finds every (disease, cell)
+    with more than N / capacity cases in a single hour; each reported count
+    is at most its reported error above the true one. Summed over several
+    hours, an hour whose summary no longer tracks a key can also leave out
+    up to that summary's smallest count.
+    """
+
+    def __init__(self, cell_degrees: float = 0.1, retention_hours: int = 168,
+                 width: int = 2048, depth: int = 4, capacity: int = 100):
+        self.cell_degrees = cell_degrees
+        self.retention_hours = retention_hours
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        # hour -> (CountMinSketch, SpaceSaving)
+        self.hours = {}
+        self.latest_hour = None
+
+    def cell(self, location) -> Optional[Tuple[int, int]]:
+        point = coordinates(location) if location is not None else None
+        if point is None:
+            return None
+        return math.floor(point[0] / self.cell_degrees), math.floor(point[1] / self.cell_degrees)
+
+    @staticmethod
+    def key(disease: str, cell: Optional[Tuple[int, int]]) -> str:
+        return f"{disease}|{cell[0]}:{cell[1]}" if cell is not None else f"{disease}|{NO_LOCATION}"
+
+    def expire(self, now_hour: int):
+        self.latest_hour = max(now_hour, self.latest_hour or now_hour)
+        for hour in [hour for hour in self.hours if hour <= self.latest_hour - self.retention_hours]:
+            del self.hours[hour]
+
+    def add(self, disease: str, location=None, when: Optional[datetime] = None):
+        hour = hour_bucket(when or datetime.utcnow())
+        summaries = self.hours.get(hour)
+        if summaries is None:
+            self.expire(hour)
+            if hour <= self.latest_hour - self.retention_hours:
+                # Older than anything still kept
+                return
+            summaries = self.hours[hour] = (CountMinSketch(self.width, self.depth), SpaceSaving(self.capacity))
+        key = self.key(disease, self.cell(location))
+        summaries[0].add(key)
+        summaries[1].add(key)
+
+    def recent(self, hours: int, now: Optional[datetime] = None):
+        now_hour = hour_bucket(now or datetime.utcnow())
+        return [summaries for hour, summaries in self.hours.items() if now_hour - hours < hour <= now_hour]
+
+    def count(self, disease: str, location, hours: int, neighbours: bool = True,
+              now: Optional[datetime] = None) -> dict:
+        """Estimated cases of disease in the location's cell (and the 8 around it) in the last hours.
+
+        Every summed estimate is within its hour's bound with the returned
+        confidence, so the total is within error_bound with at least that.
+        """
+        row, column = self.cell(location)
+        offsets = (-1, 0, 1) if neighbours else (0,)
+        keys = [self.key(disease, (row + i, column + j)) for i in offsets for j in offsets]
+        sketches = [sketch for sketch, heavy in self.recent(hours, now)]
+        return {
+            "estimate": sum(sketch.estimate(key) for sketch in sketches for key in keys),
+            # Each of the len(keys) estimates per hour can be off by that hour's bound
+            "error_bound": len(keys) * sum(sketch.error_bound() for sketch in sketches),
+            "confidence": 1 - math.exp(-self.depth),
+            "cases_in_window": sum(sketch.total for sketch in sketches),
+        }
+
+    def heavy_hitters(self, hours: int, n: int = 10, now: Optional[datetime] = None) -> List[dict]:
+        merged = {}
+        for sketch, heavy in self.recent(hours, now):
+            for key, count, error in heavy.top(heavy.capacity):
+                total = merged.setdefault(key, [0, 0])
+                total[0] += count
+                total[1] += error
+        ranked = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)[:n]
+        results = []
+        for key, (count, error) in ranked:
+            disease, _, cell = key.rpartition("|")
+            region = None
+            if cell != NO_LOCATION:
+                row, column = map(int, cell.split(":"))
+                region = {"latitude": (row + 0.5) * self.cell_degrees, "longitude": (column + 0.5) * self.cell_degrees}
+            results.append({"disease": disease, "cell_center": region, "count": count, "max_error": error})
+        return results
+
+    def snapshot(self) -> List[dict]:
+        return [{
+            "hour": hour,
+            "width": sketch.width,
+            "depth": sketch.depth,
+            "table": sketch.table.astype(np.int64).tobytes(),
+            "capacity": heavy.capacity,
+            "heavy": [[key, count, error] for key, (count, error) in heavy.counters.items()],
+        } for hour, (sketch, heavy) in self.hours.items()]
+
+    def restore(self, documents: Iterable[dict]):
+        # Documents of the same hour, e.g. from several processes, are added up
+        for document in documents:
+            if document["width"] != self.width or document["depth"] != self.depth:
+                # Sketches of another shape cannot be combined with these
+                continue
+            table = np.frombuffer(document["table"], dtype=np.int64).reshape(self.depth, self.width).copy()
+            heavy = sorted(document["heavy"], key=lambda item: item[1], reverse=True)[:self.capacity]
+            current = self.hours.get(document["hour"])
+            if current is not None:
+                # Cases added before the restore finished are kept on top
+                current[0].table += table
+                current[0].total += int(table[0].sum())
+                for key, count, error in heavy:
+                    current[1].add(key, count)
+                    current[1].counters[key][1] += error
+                continue
+            counters = {key: [count, error] for key, count, error in heavy}
+            self.hours[document["hour"]] = (CountMinSketch(self.width, self.depth, table),
+                                           SpaceSaving(self.capacity, counters))
+        self.expire(hour_bucket(datetime.utcnow()))
@@ -0,0 +1,67 @@
+# utils/symptom_lookup.py
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.model_registry import ensemble_predict
+
+SYMPTOM_TRAIN_DATA = "prediction/Training.csv"
+
+
+def pack_indices(indices: Iterable[int]) -> int:
+    # Bit i is set when symptom i is present
+    key = 0
+    for index in indices:
+        key |= 1 << int(index)
+    return key
+
+
+def pack_rows(X: np.ndarray):
+    bits = np.packbits(np.asarray(X, dtype=np.uint8), axis=1, bitorder="little")
+    return [int.from_bytes(row.tobytes(), "little") for row in bits]
+
+
+class SymptomLookup:
+    """Exact-match answers for symptom vectors seen in the training data.
+
+    Training.csv repeats the same few hundred vectors many times, so the
+    served ensemble is run once over the distinct ones and a dict keyed by
+    the packed bitset answers those combinations without touching the
+    models again. Answers are the ensemble's, so they match /predict.
+    """
+
+    def __init__(self, table: Dict[int, str], n_symptoms: int):
+        self.table = table
+        self.n_symptoms = n_symptoms
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_ensemble(cls, models, path: str = SYMPTOM_TRAIN_DATA):
+        data = pd.read_csv(path).dropna(axis=1)
+        # Same dtype as the encoded request vectors
+        X = np.unique(data.iloc[:, :-1].to_numpy(dtype=np.uint8), axis=0)
+        if X.shape[1] != len(models[3]["symptom_index"]):
+            # Training data for another model version, nothing to precompute
+            return cls({}, 0)
+        diseases = ensemble_predict(models, X)
+        return cls({key: str(disease) for key, disease in zip(pack_rows(X), diseases)}, X.shape[1])
+
+    def get(self, key: int) -> Optional[str]:
+        disease = self.table.get(key)
+        if disease is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return disease
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.table),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
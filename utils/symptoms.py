@@ -0,0 +1,59 @@
+# utils/symptoms.py
+
+import re
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from utils.model_registry import registry
+
+
+def normalize_symptom(symptom: str) -> str:
+    # "Skin Rash", "skin_rash" and " SKIN  rash" all become "skin rash"
+    return re.sub(r"\s+", " ", symptom.replace("_", " ")).strip().casefold()
+
+
+def split_symptoms(text: str) -> List[str]:
+    return [symptom.strip() for symptom in text.split(",")]
+
+
+class SymptomEncoder:
+    """Maps free-text symptom names to model columns, many requests at a time."""
+
+    def __init__(self, symptom_index: Dict[str, int]):
+        self.symptom_index = symptom_index
+        self.n_symptoms = len(symptom_index)
+        self.index = {normalize_symptom(name): index for name, index in symptom_index.items()}
+
+    def indices(self, symptoms: Sequence[str]) -> Tuple[List[int], List[str]]:
+        found, unknown = [], []
+        for symptom in symptoms:
+            index = self.index.get(normalize_symptom(symptom))
+            if index is None:
+                unknown.append(symptom)
+            elif index not in found:
+                found.append(index)
+        return found, unknown
+
+    def encode(self, batch: Sequence[Sequence[str]]) -> Tuple[np.ndarray, List[List[str]]]:
+        rows, columns, unknown = [], [], []
+        for row, symptoms in enumerate(batch):
+            found, missing = self.indices(symptoms)
+            rows.extend([row] * len(found))
+            columns.extend(found)
+            unknown.append(missing)
+        X = np.zeros((len(batch), self.n_symptoms), dtype=np.uint8)
+        X[rows, columns] = 1
+        return X, unknown
+
+
+_encoder = None
+
+
+def symptom_encoder() -> SymptomEncoder:
+    # Rebuilt whenever a reload brings a different symptom index
+    global _encoder
+    symptom_index = registry.get("symptom")[3]["symptom_index"]
+    if _encoder is None or _encoder.symptom_index is not symptom_index:
+        _encoder = SymptomEncoder(symptom_index)
+    return _encoder